@@ -0,0 +1,37 @@
+import re
+from typing import List, Sequence
+from langchain_core.documents import Document
+
+_HEADER_PATTERN = re.compile(r"^(#{1,3})\s+(.+?)\s*#*\s*$")
+
+
+def get_header_paths(chunks: Sequence[Document]) -> List[str]:
+    # Chunks keep their headers (strip_headers=False), so the path of every chunk
+    # is rebuilt by replaying the headers of all the chunks before it
+    header_stack: List[str] = []
+    header_paths = []
+    for chunk in chunks:
+        in_code_block = False
+        for line in chunk.page_content.splitlines():
+            if line.lstrip().startswith("```"):
+                in_code_block = not in_code_block
+                continue
+            match = None if in_code_block else _HEADER_PATTERN.match(line)
+            if match:
+                level = len(match.group(1))
+                header_stack = header_stack[: level - 1] + [match.group(2)]
+        header_paths.append(" > ".join(header_stack))
+    return header_paths
+
+
+def get_neighbouring_chunks(
+    chunks: Sequence[Document], chunk_index: int, neighbour_count: int
+) -> str:
+    start = max(0, chunk_index - neighbour_count)
+    end = min(len(chunks), chunk_index + neighbour_count + 1)
+    return "\n\n".join(
+        chunks[index].page_content
+        for index in range(start, end)
+        if index != chunk_index
+    )
+
@@ -1,11 +1,17 @@
 from langgraph.graph import StateGraph, START, END
+from langgraph.graph.state import CompiledStateGraph
 from langchain.messages import ToolMessage
+from langchain_core.prompts import ChatPromptTemplate
+from typing import Dict
+import threading
 from test_agent.schemas.agent_schemas.prd_agent_schemas import (
     InsigntsValidatorState,
 )
 from test_agent.llm.model_manager import ModelManager
+from test_agent import config
 from test_agent.agents.prd_agent.prompt_templates import (
     CHUNK_LEVEL_PRD_INSIGHTS_VALIDATOR_TEMPLATE,
+    CHUNK_LEVEL_WINDOWED_INSIGHTS_VALIDATOR_TEMPLATE,
 )
 from test_agent.agents.prd_agent.insight_tools import (
     add_concern,
@@ -17,34 +23,62 @@ from test_agent.agents.prd_agent.insight_tools import (
 
 class InsightsValidatorAgent:
 
+    _compiled_agent: CompiledStateGraph = None
+    _compile_lock = threading.Lock()
+
     def __init__(self):
-        self.build_agent()
+        self.agent = self.get_compiled_agent()
+
+    @classmethod
+    def get_compiled_agent(cls) -> CompiledStateGraph:
+        if cls._compiled_agent is None:
+            with cls._compile_lock:
+                if cls._compiled_agent is None:
+                    cls._compiled_agent = cls.__new__(cls).build_agent()
+        return cls._compiled_agent
+
+    def build_prompt(
+        self, state: InsigntsValidatorState
+    ) -> tuple[ChatPromptTemplate, Dict]:
+
+        prompt_inputs = {
+            "chunk": state.prd_chunk,
+            "existing_product_insights": "\n".join(
+                [
+                    f"{i+1}. {insight.description}"
+                    for i, insight in enumerate(state.insights)
+                ]
+            ),
+            "existing_concerns": "\n".join(
+                [
+                    f"{i+1}. {concern.description}"
+                    for i, concern in enumerate(state.concerns)
+                ]
+            ),
+        }
+        context_mode = state.config.get(
+            "CHUNK_VALIDATION_CONTEXT_MODE", config.CHUNK_VALIDATION_CONTEXT_MODE
+        )
+        if context_mode == "FULL":
+            prompt_inputs["markdown_prd"] = state.document.page_content
+            return CHUNK_LEVEL_PRD_INSIGHTS_VALIDATOR_TEMPLATE, prompt_inputs
+
+        prompt_inputs["header_path"] = state.header_path
+        prompt_inputs["neighbouring_chunks"] = state.neighbouring_chunks
+        return CHUNK_LEVEL_WINDOWED_INSIGHTS_VALIDATOR_TEMPLATE, prompt_inputs
 
-    def validate_insights(
+    async def validate_insights(
         self, state: InsigntsValidatorState
     ) -> InsigntsValidatorState:
 
-        insights_validator_llm = ModelManager.get_instance().bind_tools(
-            [add_product_insight, add_concern]
+        insights_validator_llm = ModelManager.bind_prompt_cache(
+            ModelManager.get_instance().bind_tools([add_product_insight, add_concern]),
+            prompt_cache_key=state.document.hash,
         )
-        chain = CHUNK_LEVEL_PRD_INSIGHTS_VALIDATOR_TEMPLATE | insights_validator_llm
-        response = chain.invoke(
-            {
-                "markdown_prd": state.document.page_content,
-                "chunk": state.prd_chunk,
-                "existing_product_insights": "\n".join(
-                    [
-                        f"{i+1}. {insight.description}"
-                        for i, insight in enumerate(state.insights)
-                    ]
-                ),
-                "existing_concerns": "\n".join(
-                    [
-                        f"{i+1}. {concern.description}"
-                        for i, concern in enumerate(state.concerns)
-                    ]
-                ),
-            }
+        prompt_template, prompt_inputs = self.build_prompt(state)
+        chain = prompt_template | insights_validator_llm
+        response = await ModelManager.get_throttle().run(
+            lambda: chain.ainvoke(prompt_inputs)
         )
         return {"messages": [response]}
 
@@ -93,7 +127,7 @@ class InsightsValidatorAgent:
             "tool_messages": tool_messages,
         }
 
-    def build_agent(self):
+    def build_agent(self) -> CompiledStateGraph:
 
         graph = StateGraph(InsigntsValidatorState)
         graph.add_node("validate_insights", self.validate_insights)
@@ -102,18 +136,18 @@ class InsightsValidatorAgent:
         graph.add_edge(START, "validate_insights")
         graph.add_edge("validate_insights", "tool_node")
         graph.add_edge("tool_node", END)
-        self.agent = graph.compile()
+        return graph.compile()
 
-    def invoke(self, state: InsigntsValidatorState) -> dict:
+    async def ainvoke(self, state: InsigntsValidatorState) -> dict:
 
         if not state.prd_chunk or len(state.prd_chunk) < 0:
             raise ValueError(
                 "No PRD / PRD prd_text found in Agent State to Extract Insights"
             )
-        result = self.agent.invoke(state)
+        result = await self.agent.ainvoke(state)
 
         return {
             "insights": result["new_insights"],
-            "conerns": result["new_concerns"],
+            "concerns": result["new_concerns"],
             "messages": result["tool_messages"],
         }
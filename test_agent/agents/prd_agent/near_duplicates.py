@@ -0,0 +1,178 @@
+import hashlib
+import re
+from collections import defaultdict
+from typing import Dict, List, Sequence
+import numpy as np
+from test_agent import config
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+_rng = np.random.default_rng(seed=7)
+_PERMUTATION_A = _rng.integers(
+    1, 2**32, size=config.NEAR_DUPLICATE_NUM_PERMUTATIONS, dtype=np.uint64
+)
+_PERMUTATION_B = _rng.integers(
+    0, 2**32, size=config.NEAR_DUPLICATE_NUM_PERMUTATIONS, dtype=np.uint64
+)
+
+
+def _item_text(item) -> str:
+    return f"{getattr(item, 'title', '')} {item.description}"
+
+
+def shingles(text: str, size: int = None) -> set[str]:
+    size = size or config.NEAR_DUPLICATE_SHINGLE_SIZE
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {
+        " ".join(words[index : index + size])
+        for index in range(len(words) - size + 1)
+    }
+
+
+def _shingle_hashes(item_shingles: set[str]) -> np.ndarray:
+    return np.fromiter(
+        (
+            int.from_bytes(
+                hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "big"
+            )
+            for shingle in item_shingles
+        ),
+        dtype=np.uint64,
+        count=len(item_shingles),
+    )
+
+
+def minhash_signatures(items_shingles: Sequence[set[str]]) -> np.ndarray:
+    # (items x permutations) matrix; permutation i of shingle x is (a_i * x + b_i) mod 2^32
+    signatures = np.full(
+        (len(items_shingles), len(_PERMUTATION_A)), _MAX_HASH, dtype=np.uint64
+    )
+    for item_index, item_shingles in enumerate(items_shingles):
+        if not item_shingles:
+            continue
+        hashes = _shingle_hashes(item_shingles)
+        permuted = (
+            np.outer(_PERMUTATION_A, hashes) + _PERMUTATION_B[:, None]
+        ) & _MAX_HASH
+        signatures[item_index] = permuted.min(axis=1)
+    return signatures
+
+
+def candidate_probability(similarity: float, bands: int, rows: int) -> float:
+    return 1 - (1 - similarity**rows) ** bands
+
+
+def lsh_band_layout(
+    num_permutations: int = None, threshold: float = None, min_recall: float = None
+) -> tuple[int, int]:
+    # Fewest bands (so fewest spurious candidates) that still make a pair at the
+    # ambiguous threshold a candidate with `min_recall` probability
+    num_permutations = num_permutations or config.NEAR_DUPLICATE_NUM_PERMUTATIONS
+    threshold = threshold or config.NEAR_DUPLICATE_AMBIGUOUS_THRESHOLD
+    min_recall = min_recall or config.NEAR_DUPLICATE_LSH_MIN_RECALL
+    for rows in range(num_permutations, 0, -1):
+        if num_permutations % rows:
+            continue
+        bands = num_permutations // rows
+        if candidate_probability(threshold, bands, rows) >= min_recall:
+            return bands, rows
+    return num_permutations, 1
+
+
+def _candidate_pairs(signatures: np.ndarray) -> set[tuple[int, int]]:
+    # LSH banding: items agreeing on every row of at least one band become candidates
+    bands, rows = lsh_band_layout(signatures.shape[1])
+    candidate_pairs = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        band_rows = np.ascontiguousarray(signatures[:, band * rows : (band + 1) * rows])
+        for item_index, band_row in enumerate(band_rows):
+            buckets[band_row.tobytes()].append(item_index)
+        for bucket in buckets.values():
+            for position, first in enumerate(bucket):
+                for second in bucket[position + 1 :]:
+                    candidate_pairs.add((first, second))
+    return candidate_pairs
+
+
+def _estimated_similarities(signatures: np.ndarray, pairs: np.ndarray) -> np.ndarray:
+    # Share of agreeing MinHash rows, in batches to bound the (pairs x permutations) mask
+    estimates = np.empty(len(pairs))
+    for start in range(0, len(pairs), config.NEAR_DUPLICATE_ESTIMATE_BATCH_SIZE):
+        batch = pairs[start : start + config.NEAR_DUPLICATE_ESTIMATE_BATCH_SIZE]
+        estimates[start : start + len(batch)] = (
+            signatures[batch[:, 0]] == signatures[batch[:, 1]]
+        ).mean(axis=1)
+    return estimates
+
+
+def jaccard_similarity(first: set[str], second: set[str]) -> float:
+    if not first and not second:
+        return 1.0
+    return len(first & second) / len(first | second)
+
+
+def _find_root(parents: List[int], index: int) -> int:
+    while parents[index] != index:
+        parents[index] = parents[parents[index]]
+        index = parents[index]
+    return index
+
+
+def find_near_duplicates(items: Sequence) -> Dict[str, List]:
+    # Returns the items to delete locally (exact / near-exact duplicates of a kept item)
+    # and the items whose similarity is ambiguous and still needs the LLM's judgement
+    items = list(items)
+    items_shingles = [shingles(_item_text(item)) for item in items]
+    signatures = minhash_signatures(items_shingles)
+    candidate_pairs = np.array(list(_candidate_pairs(signatures)), dtype=np.intp)
+    if len(candidate_pairs):
+        # The wider band layout also catches many dissimilar pairs; drop the ones whose
+        # MinHash estimate is clearly below the ambiguous threshold before exact Jaccard
+        estimates = _estimated_similarities(signatures, candidate_pairs)
+        candidate_pairs = candidate_pairs[
+            estimates
+            >= config.NEAR_DUPLICATE_AMBIGUOUS_THRESHOLD
+            - config.NEAR_DUPLICATE_ESTIMATE_MARGIN
+        ]
+
+    parents = list(range(len(items)))
+    ambiguous_pairs = []
+    for first, second in candidate_pairs.tolist():
+        similarity = jaccard_similarity(items_shingles[first], items_shingles[second])
+        if similarity >= config.NEAR_DUPLICATE_THRESHOLD:
+            parents[_find_root(parents, first)] = _find_root(parents, second)
+        elif similarity >= config.NEAR_DUPLICATE_AMBIGUOUS_THRESHOLD:
+            ambiguous_pairs.append((first, second))
+
+    clusters = defaultdict(list)
+    for index in range(len(items)):
+        clusters[_find_root(parents, index)].append(index)
+
+    duplicates = []
+    kept_indexes = {}
+    for root, cluster in clusters.items():
+        # Keep the most detailed item of every cluster
+        kept_indexes[root] = max(
+            cluster, key=lambda index: (len(items_shingles[index]), -index)
+        )
+        duplicates.extend(
+            items[index] for index in cluster if index != kept_indexes[root]
+        )
+
+    # Ambiguous pairs are judged between the items kept for their two clusters
+    ambiguous_indexes = set()
+    for first, second in ambiguous_pairs:
+        first_root = _find_root(parents, first)
+        second_root = _find_root(parents, second)
+        if first_root != second_root:
+            ambiguous_indexes.add(kept_indexes[first_root])
+            ambiguous_indexes.add(kept_indexes[second_root])
+
+    return {
+        "duplicates": duplicates,
+        "ambiguous": [items[index] for index in sorted(ambiguous_indexes)],
+    }
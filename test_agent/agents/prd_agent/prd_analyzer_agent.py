@@ -1,20 +1,36 @@
 from langgraph.graph import StateGraph, START, END
+from langgraph.graph.state import CompiledStateGraph
 from langgraph.types import Send
 from langchain.messages import ToolMessage
-from typing import Dict
+from typing import AsyncIterator, Dict
+from uuid import UUID
+import argparse
+import asyncio
+import threading
+import time
 from test_agent.schemas.agent_schemas.prd_agent_schemas import (
     PrdAnalyzerAgentState,
     InsigntsValidatorState,
+    active_items,
 )
 from test_agent.agents.prd_agent.chunk_level_insights_validator_agent import (
     InsightsValidatorAgent,
 )
+from test_agent.agents.prd_agent.chunk_context import (
+    get_header_paths,
+    get_neighbouring_chunks,
+)
+from test_agent.agents.prd_agent.relevance_index import RelevanceIndex
+from test_agent.agents.prd_agent.near_duplicates import find_near_duplicates
 from test_agent.agents.prd_agent.prompt_templates import (
     PRD_INSIGHTS_EXTRACTOR_TEMPLATE,
     PRD_INSIGHTS_REFLECTOR_TEMPLATE,
     INSIGHTS_DEDUPLICATION_TEMPLATE,
 )
 from test_agent.llm.model_manager import ModelManager
+from test_agent.llm.usage import TokenUsageTracker
+from test_agent.llm.instrumentation import NodeTracer
+from test_agent.llm.response_cache import is_cached_message
 from test_agent import config
 from test_agent.agents.prd_agent.insight_tools import (
     add_concern,
@@ -26,19 +42,51 @@ from test_agent.agents.prd_agent.insight_tools import (
 )
 
 
+STREAMED_STATE_KEYS = ("insights", "concerns", "deleted_insights", "deleted_concerns")
+
+
 class PrdAnalyzerAgent:
 
-    def __init__(self):
-        self.build_agent()
+    _compiled_agent: CompiledStateGraph = None
+    _compile_lock = threading.Lock()
+    _reflection_metrics_lock = threading.Lock()
+    _reflection_metrics = {
+        "runs": 0,
+        "rounds_run": 0,
+        "rounds_saved": 0,
+        "stop_reasons": {},
+    }
 
-    def extract_insights(self, state: PrdAnalyzerAgentState) -> PrdAnalyzerAgentState:
+    def __init__(self):
+        self.agent = self.get_compiled_agent()
+
+    @classmethod
+    def get_compiled_agent(cls) -> CompiledStateGraph:
+        # Nodes hold no per-instance state, so the graph is compiled once per process
+        if cls._compiled_agent is None:
+            with cls._compile_lock:
+                if cls._compiled_agent is None:
+                    cls._compiled_agent = cls.__new__(cls).build_agent()
+        return cls._compiled_agent
+
+    async def extract_insights(
+        self, state: PrdAnalyzerAgentState
+    ) -> PrdAnalyzerAgentState:
 
-        insights_llm = ModelManager.get_instance().bind_tools(
-            [add_product_insight, add_concern]
+        insights_llm = ModelManager.bind_prompt_cache(
+            ModelManager.get_instance().bind_tools([add_product_insight, add_concern]),
+            prompt_cache_key=state.document.hash,
         )
         chain = PRD_INSIGHTS_EXTRACTOR_TEMPLATE | insights_llm
-        response = chain.invoke({"markdown_prd": state.document.page_content})
-        return {"messages": [response]}
+        # The reflection time budget includes the extraction call itself
+        analysis_started_at = time.time()
+        response = await ModelManager.get_throttle().run(
+            lambda: chain.ainvoke({"markdown_prd": state.document.page_content})
+        )
+        return {
+            "messages": [response],
+            "var": {"analysis_started_at": analysis_started_at},
+        }
 
     def tool_node(self, state: PrdAnalyzerAgentState) -> PrdAnalyzerAgentState:
         insights = []
@@ -82,7 +130,9 @@ class PrdAnalyzerAgent:
 
             if tool_call["name"] == "delete_product_insight":
                 try:
-                    insight_id = delete_product_insight.invoke(tool_call["args"])
+                    insight_id = UUID(
+                        str(delete_product_insight.invoke(tool_call["args"]))
+                    )
                     deleted_insights.append(insight_id)
                     tool_messages.append(
                         ToolMessage(
@@ -96,7 +146,7 @@ class PrdAnalyzerAgent:
                     )
             if tool_call["name"] == "delete_concern":
                 try:
-                    concern_id = delete_concern.invoke(tool_call["args"])
+                    concern_id = UUID(str(delete_concern.invoke(tool_call["args"])))
                     deleted_concerns.append(concern_id)
                     tool_messages.append(
                         ToolMessage(
@@ -113,48 +163,121 @@ class PrdAnalyzerAgent:
             "concerns": concerns,
             "messages": tool_messages,
             "deleted_insights": deleted_insights,
-            "deleted_concern": deleted_concerns,
+            "deleted_concerns": deleted_concerns,
         }
 
-    def should_reflect(self, state: PrdAnalyzerAgentState) -> bool:
+    def _reflection_stop_reason(self, state: PrdAnalyzerAgentState) -> str | None:
 
-        if state.var.get("reflection_counter", 0) < state.config.get(
+        reflection_counter = state.var.get("reflection_counter", 0)
+        if reflection_counter >= state.config.get(
             "MAX_REFLECTION_COUNTER", config.MAX_REFLECTION_COUNT
         ):
-            return True
-        return False
+            return "max_rounds"
+
+        if reflection_counter > 0:
+            baseline = state.var["reflection_baseline"]
+            added = len(state.insights) + len(state.concerns) - baseline
+            if added <= 0:
+                return "converged"
+            if added / max(baseline, 1) < state.config.get(
+                "REFLECTION_MIN_MARGINAL_YIELD", config.REFLECTION_MIN_MARGINAL_YIELD
+            ):
+                return "low_yield"
+
+        if state.var.get("reflection_tokens", 0) >= state.config.get(
+            "REFLECTION_TOKEN_BUDGET", config.REFLECTION_TOKEN_BUDGET
+        ):
+            return "token_budget"
+        if time.time() - state.var.get("analysis_started_at", time.time()) >= (
+            state.config.get(
+                "REFLECTION_TIME_BUDGET_SECONDS", config.REFLECTION_TIME_BUDGET_SECONDS
+            )
+        ):
+            return "time_budget"
+        return None
 
-    def reflect_insights(self, state: PrdAnalyzerAgentState) -> PrdAnalyzerAgentState:
+    def check_reflection_budget(
+        self, state: PrdAnalyzerAgentState
+    ) -> PrdAnalyzerAgentState:
+
+        stop_reason = self._reflection_stop_reason(state)
+        if stop_reason is None:
+            return {"var": {"reflection_stop_reason": None}}
+
+        rounds_run = state.var.get("reflection_counter", 0)
+        rounds_saved = max(
+            state.config.get("MAX_REFLECTION_COUNTER", config.MAX_REFLECTION_COUNT)
+            - rounds_run,
+            0,
+        )
+        with self._reflection_metrics_lock:
+            self._reflection_metrics["runs"] += 1
+            self._reflection_metrics["rounds_run"] += rounds_run
+            self._reflection_metrics["rounds_saved"] += rounds_saved
+            stop_reasons = self._reflection_metrics["stop_reasons"]
+            stop_reasons[stop_reason] = stop_reasons.get(stop_reason, 0) + 1
+        print(
+            f"Reflection stopped for document '{state.document.id}' after {rounds_run} rounds "
+            f"({stop_reason}), {rounds_saved} rounds saved"
+        )
+        return {"var": {"reflection_stop_reason": stop_reason}}
+
+    def should_reflect(self, state: PrdAnalyzerAgentState) -> bool:
+        return state.var.get("reflection_stop_reason") is None
+
+    @classmethod
+    def get_reflection_metrics(cls) -> Dict:
+        with cls._reflection_metrics_lock:
+            metrics = dict(cls._reflection_metrics)
+            metrics["stop_reasons"] = dict(metrics["stop_reasons"])
+        return metrics
+
+    async def reflect_insights(
+        self, state: PrdAnalyzerAgentState
+    ) -> PrdAnalyzerAgentState:
 
         reflection_counter = state.var.get("reflection_counter", 0)
         reflection_counter += 1
 
-        insights_llm = ModelManager.get_instance().bind_tools(
-            [add_product_insight, add_concern]
+        insights_llm = ModelManager.bind_prompt_cache(
+            ModelManager.get_instance().bind_tools([add_product_insight, add_concern]),
+            prompt_cache_key=state.document.hash,
         )
         chain = PRD_INSIGHTS_REFLECTOR_TEMPLATE | insights_llm
-        response = chain.invoke(
-            {
-                "markdown_prd": state.document.page_content,
-                "existing_product_insights": "\n".join(
-                    [
-                        f"{i+1}. {insight.description}"
-                        for i, insight in enumerate(state.insights)
-                        if insight.id not in state.deleted_insights
-                    ]
-                ),
-                "existing_concerns": "\n".join(
-                    [
-                        f"{i+1}. {concern.description}"
-                        for i, concern in enumerate(state.concerns)
-                        if concern.id not in state.deleted_concerns
-                    ]
-                ),
-            }
+        prompt_inputs = {
+            "markdown_prd": state.document.page_content,
+            "existing_product_insights": "\n".join(
+                [
+                    f"{i+1}. {insight.description}"
+                    for i, insight in enumerate(
+                        active_items(state.insights, state.deleted_insights)
+                    )
+                ]
+            ),
+            "existing_concerns": "\n".join(
+                [
+                    f"{i+1}. {concern.description}"
+                    for i, concern in enumerate(
+                        active_items(state.concerns, state.deleted_concerns)
+                    )
+                ]
+            ),
+        }
+        response = await ModelManager.get_throttle().run(
+            lambda: chain.ainvoke(prompt_inputs)
+        )
+        # Replays from the response cache cost nothing, so they do not use up the budget
+        usage_metadata = (
+            {} if is_cached_message(response) else (response.usage_metadata or {})
         )
         return {
             "messages": [response],
-            "var": {"reflection_counter": reflection_counter},
+            "var": {
+                "reflection_counter": reflection_counter,
+                "reflection_baseline": len(state.insights) + len(state.concerns),
+                "reflection_tokens": state.var.get("reflection_tokens", 0)
+                + usage_metadata.get("total_tokens", 0),
+            },
         }
 
     def chunk_documents(self, state: PrdAnalyzerAgentState) -> PrdAnalyzerAgentState:
@@ -163,44 +286,118 @@ class PrdAnalyzerAgent:
         # return {"document": updated_document}
         return {}
 
-    def chunk_level_validation_orchestrator(
+    async def chunk_level_validation_orchestrator(
         self, state: PrdAnalyzerAgentState
     ) -> PrdAnalyzerAgentState:
+        # Building the BM25 indexes is CPU-bound; keep it off the event loop that also
+        # serves the SSE streams
+        return await asyncio.to_thread(self.build_chunk_validation_sends, state)
+
+    def build_chunk_validation_sends(self, state: PrdAnalyzerAgentState) -> list[Send]:
+
+        context_mode = state.config.get(
+            "CHUNK_VALIDATION_CONTEXT_MODE", config.CHUNK_VALIDATION_CONTEXT_MODE
+        )
+        if context_mode == "FULL":
+            return [
+                Send(
+                    "chunk_level_insight_validator",
+                    InsigntsValidatorState(
+                        prd_chunk=chunk.page_content,
+                        document=state.document,
+                        insights=state.insights,
+                        concerns=state.concerns,
+                        config=state.config,
+                    ),
+                )
+                for chunk in state.document.chunks
+            ]
+
+        neighbour_count = state.config.get(
+            "CHUNK_VALIDATION_NEIGHBOUR_CHUNKS", config.CHUNK_VALIDATION_NEIGHBOUR_CHUNKS
+        )
+        max_relevant_items = state.config.get(
+            "CHUNK_VALIDATION_MAX_RELEVANT_ITEMS",
+            config.CHUNK_VALIDATION_MAX_RELEVANT_ITEMS,
+        )
+        header_paths = get_header_paths(state.document.chunks)
+        insights_index = RelevanceIndex(state.insights)
+        concerns_index = RelevanceIndex(state.concerns)
         return [
             Send(
                 "chunk_level_insight_validator",
                 InsigntsValidatorState(
                     prd_chunk=chunk.page_content,
+                    header_path=header_paths[chunk_index],
+                    neighbouring_chunks=get_neighbouring_chunks(
+                        state.document.chunks, chunk_index, neighbour_count
+                    ),
                     document=state.document,
-                    insights=state.insights,
-                    concerns=state.concerns,
+                    insights=insights_index.top_k(
+                        f"{header_paths[chunk_index]} {chunk.page_content}",
+                        max_relevant_items,
+                    ),
+                    concerns=concerns_index.top_k(
+                        f"{header_paths[chunk_index]} {chunk.page_content}",
+                        max_relevant_items,
+                    ),
+                    config=state.config,
                 ),
             )
-            for chunk in state.document.chunks
+            for chunk_index, chunk in enumerate(state.document.chunks)
         ]
 
-    def deduplicate_insights(
+    async def deduplicate_insights(
         self, state: PrdAnalyzerAgentState
     ) -> PrdAnalyzerAgentState:
 
+        # Near-exact duplicates are removed locally; only the items with an ambiguous
+        # near-duplicate are left for the LLM to judge. The MinHash / LSH pass is CPU-bound,
+        # so it runs off the event loop
+        insight_duplicates = await asyncio.to_thread(find_near_duplicates, state.insights)
+        concern_duplicates = await asyncio.to_thread(find_near_duplicates, state.concerns)
+        deduplication = {
+            "deleted_insights": [
+                insight.id for insight in insight_duplicates["duplicates"]
+            ],
+            "deleted_concerns": [
+                concern.id for concern in concern_duplicates["duplicates"]
+            ],
+        }
+        print(
+            f"Local deduplication for document '{state.document.id}' - removed "
+            f"{len(deduplication['deleted_insights'])} insights and {len(deduplication['deleted_concerns'])} concerns, "
+            f"{len(insight_duplicates['ambiguous'])} insights and {len(concern_duplicates['ambiguous'])} concerns left to the LLM"
+        )
+        if not insight_duplicates["ambiguous"] and not concern_duplicates["ambiguous"]:
+            return {**deduplication, "var": {"llm_deduplication": False}}
+
         deduplicator_llm = ModelManager.get_instance().bind_tools(
             [delete_product_insight, delete_concern]
         )
 
         chain = INSIGHTS_DEDUPLICATION_TEMPLATE | deduplicator_llm
-        response = chain.invoke(
-            {
-                "insights_list": [
-                    f"{insight.id} - {insight.description}"
-                    for insight in state.insights
-                ],
-                "concerns_list": [
-                    f"{concern.id} - {concern.description}"
-                    for concern in state.concerns
-                ],
-            }
+        prompt_inputs = {
+            "insights_list": [
+                f"{insight.id} - {insight.description}"
+                for insight in insight_duplicates["ambiguous"]
+            ],
+            "concerns_list": [
+                f"{concern.id} - {concern.description}"
+                for concern in concern_duplicates["ambiguous"]
+            ],
+        }
+        response = await ModelManager.get_throttle().run(
+            lambda: chain.ainvoke(prompt_inputs)
         )
-        return {"messages": [response]}
+        return {
+            "messages": [response],
+            "var": {"llm_deduplication": True},
+            **deduplication,
+        }
+
+    def needs_llm_deduplication(self, state: PrdAnalyzerAgentState) -> bool:
+        return state.var.get("llm_deduplication", False)
 
     def review_insights(self, state: PrdAnalyzerAgentState) -> PrdAnalyzerAgentState:
 
@@ -214,35 +411,33 @@ class PrdAnalyzerAgent:
         print("==" * 30)
         print("\n\n")
 
-        for insight in state.insights:
-            if insight.id not in state.deleted_insights:
-                print("--" * 30)
-                print(f"{insight.title = }")
-                print(f"{insight.description = }")
-                print(f"{insight.actors = }")
-                print(f"{insight.inputs = }")
-                print(f"{insight.expected_outcomes = }")
-                print("--" * 30)
-                print("\n")
+        for insight in active_items(state.insights, state.deleted_insights):
+            print("--" * 30)
+            print(f"{insight.title = }")
+            print(f"{insight.description = }")
+            print(f"{insight.actors = }")
+            print(f"{insight.inputs = }")
+            print(f"{insight.expected_outcomes = }")
+            print("--" * 30)
+            print("\n")
 
         print("==" * 30)
         print("CONCERNS")
         print("==" * 30)
         print("\n\n")
 
-        for concern in state.concerns:
-            if concern.id not in state.deleted_concerns:
-                print("--" * 30)
-                print(f"{concern.description = }")
-                print(f"{concern.impact = }")
-                print(f"{concern.questions = }")
-                print(f"{concern.raised_by = }")
-                print(f"{concern.related_product_insight_id = }")
-                print(f"{concern.severity = }")
-                print("--" * 30)
-                print("\n")
+        for concern in active_items(state.concerns, state.deleted_concerns):
+            print("--" * 30)
+            print(f"{concern.description = }")
+            print(f"{concern.impact = }")
+            print(f"{concern.questions = }")
+            print(f"{concern.raised_by = }")
+            print(f"{concern.related_product_insight_id = }")
+            print(f"{concern.severity = }")
+            print("--" * 30)
+            print("\n")
 
-    def build_agent(self):
+    def build_agent(self) -> CompiledStateGraph:
 
         self.chunk_level_insight_validator = InsightsValidatorAgent()
         graph = StateGraph(PrdAnalyzerAgentState)
@@ -250,9 +445,10 @@ class PrdAnalyzerAgent:
         graph.add_node("add_insights_tool_node", self.tool_node)
         graph.add_node("reflect_insights", self.reflect_insights)
         graph.add_node("update_insights_tool_node", self.tool_node)
+        graph.add_node("check_reflection_budget", self.check_reflection_budget)
         graph.add_node("chunk_documents", self.chunk_documents)
         graph.add_node(
-            "chunk_level_insight_validator", self.chunk_level_insight_validator.invoke
+            "chunk_level_insight_validator", self.chunk_level_insight_validator.ainvoke
         )
         graph.add_node("deduplicate_insights", self.deduplicate_insights)
         graph.add_node("delete_insights_tool_node", self.tool_node)
@@ -260,52 +456,118 @@ class PrdAnalyzerAgent:
 
         graph.add_edge(START, "extract_insights")
         graph.add_edge("extract_insights", "add_insights_tool_node")
+        graph.add_edge("add_insights_tool_node", "check_reflection_budget")
         graph.add_conditional_edges(
-            "add_insights_tool_node",
+            "check_reflection_budget",
             self.should_reflect,
             {True: "reflect_insights", False: "chunk_documents"},
         )
         graph.add_edge("reflect_insights", "update_insights_tool_node")
-        graph.add_conditional_edges(
-            "update_insights_tool_node",
-            self.should_reflect,
-            {True: "reflect_insights", False: "chunk_documents"},
-        )
+        graph.add_edge("update_insights_tool_node", "check_reflection_budget")
         graph.add_conditional_edges(
             "chunk_documents",
             self.chunk_level_validation_orchestrator,
             ["chunk_level_insight_validator"],
         )
         graph.add_edge("chunk_level_insight_validator", "deduplicate_insights")
-        graph.add_edge("deduplicate_insights", "delete_insights_tool_node")
+        graph.add_conditional_edges(
+            "deduplicate_insights",
+            self.needs_llm_deduplication,
+            {True: "delete_insights_tool_node", False: "review_insights"},
+        )
         graph.add_edge("delete_insights_tool_node", "review_insights")
         graph.add_edge("review_insights", END)
 
-        self.agent = graph.compile()
-        print(self.agent.get_graph().draw_ascii())
-        self.agent.get_graph().draw_mermaid_png(output_file_path="graph.png")
+        return graph.compile()
+
+    @classmethod
+    def draw_graph(cls, output_file_path: str = None):
+        graph = cls.get_compiled_agent().get_graph()
+        print(graph.draw_ascii())
+        if output_file_path:
+            graph.draw_mermaid_png(output_file_path=output_file_path)
 
     def invoke(self, state: PrdAnalyzerAgentState) -> Dict:
+        return asyncio.run(self.ainvoke(state))
+
+    async def ainvoke(self, state: PrdAnalyzerAgentState) -> Dict:
+
+        result = None
+        async for event in self.astream(state):
+            if event["event"] == "result":
+                result = event["data"]
+        return result
+
+    async def astream(self, state: PrdAnalyzerAgentState) -> AsyncIterator[Dict]:
+        # Yields the insights / concerns / deleted ids written by every node as soon as
+        # the node finishes, then a final "result" event with the same payload as ainvoke
 
         if not state.document or state.document.page_content.strip() == "":
             raise ValueError("No document found in Agent State")
 
-        final_state = self.agent.invoke(state)
-
-        result = {
-            "project_id": final_state["project_id"],
-            "release_id": final_state["release_id"],
-            "document": final_state["document"],
-            "insights": [
-                insight
-                for insight in final_state["insights"]
-                if insight.id not in final_state["deleted_insights"]
-            ],
-            "concerns": [
-                concern
-                for concern in final_state["concerns"]
-                if concern.id not in final_state["deleted_concerns"]
-            ],
+        token_usage_tracker = TokenUsageTracker()
+        node_tracer = NodeTracer()
+        final_state = None
+        async for stream_mode, chunk in self.agent.astream(
+            state,
+            config={
+                "max_concurrency": config.CHUNK_VALIDATION_MAX_CONCURRENCY,
+                "callbacks": [token_usage_tracker, node_tracer],
+            },
+            stream_mode=["updates", "values"],
+        ):
+            if stream_mode == "values":
+                final_state = chunk
+                continue
+            for node_update in chunk.values():
+                for key in STREAMED_STATE_KEYS:
+                    if node_update and node_update.get(key):
+                        yield {"event": key, "data": list(node_update[key])}
+
+        token_usage = token_usage_tracker.get_usage()
+        print(
+            f"Token usage for document '{state.document.id}' - {token_usage['llm_calls']} LLM calls "
+            f"({token_usage['llm_cache_hits']} more served from the response cache), "
+            f"{token_usage['input_tokens']} input tokens ({token_usage['cached_input_tokens']} cached, "
+            f"{token_usage['uncached_input_tokens']} uncached), {token_usage['output_tokens']} output tokens"
+        )
+        trace = node_tracer.get_trace()
+        slowest_nodes = sorted(
+            trace["nodes"].items(), key=lambda node: -node[1]["wall_seconds"]
+        )[:3]
+        print(
+            f"Node timings for document '{state.document.id}' - {trace['duration_seconds']:.1f}s total, slowest: "
+            + ", ".join(
+                f"{node} {metrics['wall_seconds']:.1f}s ({metrics['runs']} runs, {metrics['queue_wait_seconds']:.1f}s queued)"
+                for node, metrics in slowest_nodes
+            )
+        )
+        if config.NODE_TRACE_ENABLED:
+            trace_path = node_tracer.write_trace(
+                f"{state.document.id}-{int(trace['started_at'])}"
+            )
+            print(f"Node trace for document '{state.document.id}' written to {trace_path}")
+
+        yield {
+            "event": "result",
+            "data": {
+                "project_id": final_state["project_id"],
+                "release_id": final_state["release_id"],
+                "document": final_state["document"],
+                "insights": active_items(
+                    final_state["insights"], final_state["deleted_insights"]
+                ),
+                "concerns": active_items(
+                    final_state["concerns"], final_state["deleted_concerns"]
+                ),
+                "token_usage": token_usage,
+                "reflection_rounds": final_state["var"].get("reflection_counter", 0),
+                "trace": trace,
+            },
         }
 
-        return result
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the PRD analyzer graph")
+    parser.add_argument("--output", help="Also render a mermaid PNG to this path")
+    args = parser.parse_args()
+    PrdAnalyzerAgent.draw_graph(output_file_path=args.output)
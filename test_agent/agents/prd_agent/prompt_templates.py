@@ -1,11 +1,27 @@
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
+## Every prompt that carries the full PRD starts with this exact block, so the
+## extraction, reflection and FULL chunk validation calls for one document share a
+## token prefix that the provider can serve from its prompt cache.
+PRD_CONTEXT_PREFIX = """\
+-------------------
+PRODUCT REQUIREMENT DOCUMENT (PRD)
+-------------------
+
+{markdown_prd}
+
+-------------------
+END OF PRD
+-------------------
+
+"""
 
 PRD_INSIGHTS_EXTRACTOR_TEMPLATE = ChatPromptTemplate.from_messages(
     [
         (
             "system",
-            """\
+            PRD_CONTEXT_PREFIX
+            + """\
 You are a Product Insight Agent.
 
 Your task is to extract structured product knowledge from a COMPLETE
@@ -37,17 +53,9 @@ IMPORTANT:
         (
             "user",
             """\
-Below is a COMPLETE Product Requirement Document (PRD).
+The COMPLETE Product Requirement Document (PRD) is provided above.
 This is the only document to be analyzed.
 
--------------------
-PRODUCT REQUIREMENT DOCUMENT
--------------------
-
-{markdown_prd}
-
--------------------
-End of PRD.
 You must now extract ALL Product Insights and ALL Concerns in ONE response.
 """,
         ),
@@ -57,11 +65,9 @@ You must now extract ALL Product Insights and ALL Concerns in ONE response.
 from langchain_core.prompts import ChatPromptTemplate
 
 
-CHUNK_LEVEL_PRD_INSIGHTS_VALIDATOR_TEMPLATE = ChatPromptTemplate.from_messages(
-    [
-        (
-            "system",
-            """\
+## The FULL and WINDOWED chunk validation prompts differ only in the context they
+## describe and carry; the role, rules and task are shared
+CHUNK_VALIDATION_ROLE = """\
 You are a Product Insight Validation Agent.
 
 You are reviewing a PARTIAL section (chunk) of a Product Requirement Document (PRD).
@@ -76,10 +82,9 @@ from the existing extracted knowledge.
 AUTHORITATIVE CONTEXT
 --------------------
 
-• The FULL PRD represents the authoritative product definition.
-• The existing Product Insights and Concerns represent the CURRENT global understanding.
-• This chunk is only supporting evidence.
+"""
 
+CHUNK_VALIDATION_RULES = """\
 --------------------
 WHAT YOU MAY ADD
 --------------------
@@ -140,18 +145,46 @@ OUTPUT RULES
 • Do NOT acknowledge completion.
 
 Proceed carefully and conservatively.
-""",
-        ),
-        (
-            "user",
-            """\
-Below is the FULL Product Requirement Document (PRD).
+"""
 
+CHUNK_VALIDATION_TASK = """\
 --------------------
-FULL PRD
+CURRENT PRD CHUNK
 --------------------
 
-{markdown_prd}
+{chunk}
+
+--------------------
+TASK
+--------------------
+
+Review the chunk carefully.
+
+If and ONLY IF the chunk contains a valuable product behavior
+or ambiguity that is NOT already covered above,
+record it using the appropriate tool.
+
+If nothing new is found, produce no output.
+"""
+
+CHUNK_LEVEL_PRD_INSIGHTS_VALIDATOR_TEMPLATE = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            PRD_CONTEXT_PREFIX
+            + CHUNK_VALIDATION_ROLE
+            + """\
+• The FULL PRD represents the authoritative product definition.
+• The existing Product Insights and Concerns represent the CURRENT global understanding.
+• This chunk is only supporting evidence.
+
+"""
+            + CHUNK_VALIDATION_RULES,
+        ),
+        (
+            "user",
+            """\
+The FULL Product Requirement Document (PRD) is provided above.
 
 --------------------
 EXISTING PRODUCT INSIGHTS
@@ -169,34 +202,73 @@ Each line represents an existing concern:
 
 {existing_concerns}
 
+"""
+            + CHUNK_VALIDATION_TASK,
+        ),
+    ]
+)
+
+CHUNK_LEVEL_WINDOWED_INSIGHTS_VALIDATOR_TEMPLATE = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            CHUNK_VALIDATION_ROLE
+            + """\
+• You are NOT given the full PRD, only the chunk, its section path
+  and the chunks immediately before and after it.
+• The existing Product Insights and Concerns shown are the ones RELATED to this chunk,
+  taken from the CURRENT global understanding.
+• The neighbouring chunks are context only. Validate the CURRENT chunk.
+
+"""
+            + CHUNK_VALIDATION_RULES,
+        ),
+        (
+            "user",
+            """\
+Below is one section (chunk) of a Product Requirement Document (PRD)
+with the context surrounding it.
+
 --------------------
-CURRENT PRD CHUNK
+SECTION PATH
 --------------------
 
-{chunk}
+{header_path}
 
 --------------------
-TASK
+NEIGHBOURING CHUNKS (CONTEXT ONLY)
 --------------------
 
-Review the chunk carefully.
+{neighbouring_chunks}
 
-If and ONLY IF the chunk contains a valuable product behavior
-or ambiguity that is NOT already covered above,
-record it using the appropriate tool.
+--------------------
+RELATED EXISTING PRODUCT INSIGHTS
+--------------------
 
-If nothing new is found, produce no output.
-""",
+Each line represents an existing insight:
+
+{existing_product_insights}
+
+--------------------
+RELATED EXISTING CONCERNS
+--------------------
+
+Each line represents an existing concern:
+
+{existing_concerns}
+
+"""
+            + CHUNK_VALIDATION_TASK,
         ),
     ]
 )
 
-
 PRD_INSIGHTS_REFLECTOR_TEMPLATE = ChatPromptTemplate.from_messages(
     [
         (
             "system",
-            """\
+            PRD_CONTEXT_PREFIX
+            + """\
 You are a Product Insight Completion Agent.
 
 Your task is to identify MISSING Product Insights and MISSING Concerns
@@ -263,13 +335,7 @@ Your response must consist ONLY of tool calls (if any).
         (
             "user",
             """\
-Below is the Product Requirement Document (PRD).
-
---------------------
-PRODUCT REQUIREMENT DOCUMENT :
---------------------
-
-{markdown_prd}
+The Product Requirement Document (PRD) is provided above.
 
 --------------------
 EXISTING PRODUCT INSIGHTS :
@@ -0,0 +1,81 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Callable, Generic, List, Sequence, TypeVar
+from test_agent import config
+
+_TERM_PATTERN = re.compile(r"[a-z0-9]+")
+
+T = TypeVar("T")
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        term
+        for term in _TERM_PATTERN.findall(text.lower())
+        if len(term) > 2 or term.isdigit()
+    ]
+
+
+def _insight_text(item) -> str:
+    return f"{getattr(item, 'title', '')} {item.description}"
+
+
+class RelevanceIndex(Generic[T]):
+    # In-process Okapi BM25 over an inverted index, built once per graph run and
+    # queried once per chunk
+
+    def __init__(
+        self,
+        items: Sequence[T],
+        text_fn: Callable[[T], str] = _insight_text,
+        k1: float = None,
+        b: float = None,
+    ):
+        self.items = list(items)
+        self.k1 = config.RELEVANCE_INDEX_BM25_K1 if k1 is None else k1
+        self.b = config.RELEVANCE_INDEX_BM25_B if b is None else b
+        self._postings: dict[str, list[tuple[int, int]]] = defaultdict(list)
+        self._document_lengths = []
+
+        for item_index, item in enumerate(self.items):
+            terms = tokenize(text_fn(item))
+            self._document_lengths.append(len(terms))
+            for term, term_frequency in Counter(terms).items():
+                self._postings[term].append((item_index, term_frequency))
+
+        item_count = len(self.items)
+        self._average_length = (
+            sum(self._document_lengths) / item_count if item_count else 0.0
+        )
+        self._idf = {
+            term: math.log(
+                1 + (item_count - len(postings) + 0.5) / (len(postings) + 0.5)
+            )
+            for term, postings in self._postings.items()
+        }
+
+    def scores(self, query: str) -> dict[int, float]:
+
+        scores: dict[int, float] = defaultdict(float)
+        if not self._average_length:
+            return scores
+        for term in set(tokenize(query)):
+            for item_index, term_frequency in self._postings.get(term, ()):
+                length_norm = 1 - self.b + self.b * (
+                    self._document_lengths[item_index] / self._average_length
+                )
+                scores[item_index] += (
+                    self._idf[term]
+                    * term_frequency
+                    * (self.k1 + 1)
+                    / (term_frequency + self.k1 * length_norm)
+                )
+        return scores
+
+    def top_k(self, query: str, k: int) -> List[T]:
+        # Items sharing no term with the query are never returned
+        ranked = sorted(
+            self.scores(query).items(), key=lambda score: (-score[1], score[0])
+        )
+        return [self.items[item_index] for item_index, _ in ranked[:k]]
@@ -1,12 +1,39 @@
-from fastapi import FastAPI, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from python_multipart.multipart import MultipartParser, parse_options_header
+from python_multipart.exceptions import MultipartParseError
+from starlette.background import BackgroundTask
+from contextlib import asynccontextmanager
 import base64
+import json
+import threading
+from test_agent import config
 from uuid import UUID
 from uuid6 import uuid7
-from typing import List
+from typing import AsyncIterator, List
 
-from test_agent.services.document_service import ingest_document
+from test_agent.services.document_service import (
+    generate_hash,
+    save_uploaded_document,
+    spool_uploaded_document,
+)
+from test_agent.services.job_service import (
+    JobType,
+    enqueue_job,
+    is_ingest_queue_full,
+    start_job_workers,
+    stop_job_workers,
+)
+from test_agent.services.conversion_cache import get_conversion_cache_stats
+from test_agent.services.conversion_worker import shutdown_conversion_workers
+from test_agent.db.connection import close_all_connections, run_in_db_executor
+from test_agent.db.repositories.job import get_job
+from test_agent.llm.model_manager import ModelManager
+from test_agent.llm.instrumentation import render_prometheus_metrics
+from test_agent.agents.prd_agent.prd_analyzer_agent import PrdAnalyzerAgent
 from test_agent.services.product_service import (
-    generate_insights,
+    astream_insights,
     create_insights,
     create_concerns,
 )
@@ -21,6 +48,7 @@ from test_agent.db.repositories.core import (
 from test_agent.db.repositories.document import (
     get_documents_by_release,
     does_document_exist,
+    get_document_id_by_hash,
 )
 from test_agent.db.repositories.product import (
     get_insights,
@@ -35,7 +63,9 @@ from test_agent.schemas.api_schemas.core import (
     ResourceCreationResponse,
     ResourceType,
 )
+from test_agent.schemas.api_schemas.common import ReleaseStatus
 from test_agent.schemas.api_schemas.document import (
+    DocumentType,
     IngestDocumentRequest,
     IngestDocumentResponse,
 )
@@ -54,7 +84,16 @@ from test_agent.schemas.agent_schemas.prd_agent_schemas import (
 )
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_job_workers()
+    yield
+    stop_job_workers(timeout=5)
+    shutdown_conversion_workers()
+    close_all_connections()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 @app.get("/organizations")
@@ -80,6 +119,36 @@ def get_documents_endpoint(project_id: UUID, release_id: UUID):
     ]
 
 
+@app.get("/cache/conversion")
+def get_conversion_cache_stats_endpoint():
+    return get_conversion_cache_stats()
+
+
+@app.get("/cache/llm")
+def get_llm_response_cache_stats():
+    response_cache = ModelManager.get_response_cache()
+    if response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **response_cache.get_stats()}
+
+
+@app.get("/metrics/llm")
+def get_llm_throttle_metrics_endpoint():
+    return ModelManager.get_throttle_metrics()
+
+
+@app.get("/metrics/reflection")
+def get_reflection_metrics_endpoint():
+    return PrdAnalyzerAgent.get_reflection_metrics()
+
+
+@app.get("/metrics")
+def get_prometheus_metrics_endpoint() -> PlainTextResponse:
+    return PlainTextResponse(
+        render_prometheus_metrics(), media_type="text/plain; version=0.0.4"
+    )
+
+
 @app.post("/organization")
 def create_organization_endpoint(
     org: CreateOrganizationRequest,
@@ -110,28 +179,184 @@ def create_release_endpoint(release: CreateReleaseRequest) -> ResourceCreationRe
     )
 
 
+def _raise_if_ingest_queue_full():
+    if is_ingest_queue_full():
+        raise HTTPException(
+            status_code=503,
+            detail="Document conversion queue is full. Please retry the upload later.",
+            headers={"Retry-After": "30"},
+        )
+
+
+def _existing_document_response(
+    document_hash: str, project_id: UUID, release_id: UUID
+) -> IngestDocumentResponse | None:
+    document_id = get_document_id_by_hash(document_hash, project_id, release_id)
+    if document_id is None:
+        return None
+    return IngestDocumentResponse(
+        status="EXISTS",
+        message="Document is already ingested in the release",
+        document_id=document_id,
+    )
+
+
 @app.post("/document/upload")
-def upload_documents_endpoint(
-    req_body: IngestDocumentRequest, background_tasks: BackgroundTasks
-) -> IngestDocumentResponse:
+def upload_documents_endpoint(req_body: IngestDocumentRequest) -> IngestDocumentResponse:
 
     encoded_bytes = req_body.document.document_content_base64.encode("utf-8")
     doc_content_bytes = base64.b64decode(encoded_bytes, validate=True)
+    document_hash = generate_hash(doc_content_bytes)
 
-    background_tasks.add_task(
-        ingest_document,
-        project_id=req_body.project_id,
-        release_id=req_body.release_id,
-        document=doc_content_bytes,
-        document_type=req_body.document.document_type,
-        document_status=req_body.document.document_status,
+    # Duplicates are answered without conversion, even while the queue is full
+    existing_document = _existing_document_response(
+        document_hash, req_body.project_id, req_body.release_id
+    )
+    if existing_document:
+        return existing_document
+    _raise_if_ingest_queue_full()
+
+    document_path = save_uploaded_document(doc_content_bytes)
+
+    job_id = enqueue_job(
+        JobType.INGEST_DOCUMENT,
+        {
+            "project_id": str(req_body.project_id),
+            "release_id": str(req_body.release_id),
+            "document_path": str(document_path),
+            "document_type": req_body.document.document_type.value,
+            "document_status": req_body.document.document_status.value,
+            "document_hash": document_hash,
+        },
     )
-    return IngestDocumentResponse()
+    return IngestDocumentResponse(job_id=job_id)
+
+
+async def _read_multipart_file(
+    request: Request, field_name: str
+) -> AsyncIterator[bytes]:
+    # Parses the multipart body as it arrives and yields only the bytes of the
+    # `field_name` part, so nothing is spooled before the upload limit is checked
+    _, content_type_options = parse_options_header(request.headers["content-type"])
+    boundary = content_type_options.get(b"boundary")
+    if not boundary:
+        raise HTTPException(status_code=400, detail="Multipart upload without a boundary")
+
+    header_field, header_value, part_headers = b"", b"", {}
+    in_field_part, found_field = False, False
+    field_chunks: list[bytes] = []
+
+    def on_part_begin():
+        nonlocal part_headers, in_field_part
+        part_headers, in_field_part = {}, False
+
+    def on_header_field(data: bytes, start: int, end: int):
+        nonlocal header_field
+        header_field += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        nonlocal header_value
+        header_value += data[start:end]
+
+    def on_header_end():
+        nonlocal header_field, header_value
+        part_headers[header_field.lower()] = header_value
+        header_field, header_value = b"", b""
+
+    def on_headers_finished():
+        nonlocal in_field_part, found_field
+        _, disposition = parse_options_header(
+            part_headers.get(b"content-disposition", b"")
+        )
+        in_field_part = disposition.get(b"name") == field_name.encode("utf-8")
+        found_field = found_field or in_field_part
+
+    def on_part_data(data: bytes, start: int, end: int):
+        if in_field_part:
+            field_chunks.append(data[start:end])
+
+    parser = MultipartParser(
+        boundary,
+        {
+            "on_part_begin": on_part_begin,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+        },
+    )
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if field_chunks:
+                yield b"".join(field_chunks)
+                field_chunks.clear()
+        parser.finalize()
+    except MultipartParseError as e:
+        raise HTTPException(status_code=400, detail=f"Malformed multipart upload: {e}")
+
+    if not found_field:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Multipart upload requires a `{field_name}` file field",
+        )
+
+
+@app.post("/document/upload/stream")
+async def upload_document_stream_endpoint(
+    request: Request,
+    project_id: UUID,
+    release_id: UUID,
+    document_type: DocumentType,
+    document_status: ReleaseStatus = ReleaseStatus.APPROVED,
+) -> IngestDocumentResponse:
+    # Accepts the raw PDF as the request body or as the `document` field of a multipart
+    # form; either way it is streamed straight to disk
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        chunks = _read_multipart_file(request, "document")
+    else:
+        chunks = request.stream()
+
+    try:
+        upload = await spool_uploaded_document(chunks)
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    if upload["size_bytes"] == 0:
+        upload["document_path"].unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail="Uploaded document is empty")
+
+    # Hashed while streaming, so unchanged documents never reach the conversion queue
+    existing_document = await run_in_db_executor(
+        _existing_document_response, upload["document_hash"], project_id, release_id
+    )
+    if existing_document:
+        upload["document_path"].unlink(missing_ok=True)
+        return existing_document
+    try:
+        await run_in_db_executor(_raise_if_ingest_queue_full)
+    except HTTPException:
+        upload["document_path"].unlink(missing_ok=True)
+        raise
+
+    job_id = await run_in_db_executor(
+        enqueue_job,
+        JobType.INGEST_DOCUMENT,
+        {
+            "project_id": str(project_id),
+            "release_id": str(release_id),
+            "document_path": str(upload["document_path"]),
+            "document_type": document_type.value,
+            "document_status": document_status.value,
+            "document_hash": upload["document_hash"],
+        },
+    )
+    return IngestDocumentResponse(job_id=job_id)
 
 
 @app.post("/product/insights/generate")
 def generate_insights_endpoint(
-    req_body: GenerateProductInsightsRequest, backround_tasks: BackgroundTasks
+    req_body: GenerateProductInsightsRequest,
 ) -> List[GenerateProductInsightsResponse]:
 
     response = []
@@ -155,17 +380,89 @@ def generate_insights_endpoint(
                 )
             )
 
-    backround_tasks.add_task(
-        generate_insights,
-        document_ids=filtered_document_ids,
-        project_id=req_body.project_id,
-        release_id=req_body.release_id,
-    )
-    ## Create entry in  job_status table with status as INITIATED for all filtered_document_ids
+    if filtered_document_ids:
+        job_id = enqueue_job(
+            JobType.GENERATE_INSIGHTS,
+            {
+                "document_ids": [str(id) for id in filtered_document_ids],
+                "project_id": str(req_body.project_id),
+                "release_id": str(req_body.release_id),
+                "bypass_llm_cache": req_body.bypass_llm_cache,
+            },
+        )
+        for document_response in response:
+            if document_response.status == ProductInsightGenerationStatus.INITIATED:
+                document_response.job_id = job_id
 
     return response
 
 
+_insight_stream_slots = threading.BoundedSemaphore(config.INSIGHT_STREAM_MAX_CONCURRENCY)
+
+
+def _format_sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+@app.get("/product/insights/stream")
+def stream_insights_endpoint(
+    project_id: UUID,
+    release_id: UUID,
+    document_id: UUID,
+    bypass_llm_cache: bool = False,
+) -> StreamingResponse:
+    # Server-Sent Events: `insights` / `concerns` / `deleted_insights` / `deleted_concerns`
+    # batches as the graph produces (and persists) them, then `summary` or `error`
+    if not does_document_exist(document_id, project_id, release_id):
+        raise HTTPException(
+            status_code=404,
+            detail=f"Document with id '{document_id}' does not exist in povided (project + release)",
+        )
+    if not _insight_stream_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=503,
+            detail="Too many insight streams are running. Please retry later or use /product/insights/generate.",
+            headers={"Retry-After": "30"},
+        )
+
+    slot_released = threading.Event()
+
+    def release_slot():
+        if not slot_released.is_set():
+            slot_released.set()
+            _insight_stream_slots.release()
+
+    async def event_stream():
+        try:
+            async for event in astream_insights(
+                document_id, project_id, release_id, bypass_llm_cache
+            ):
+                yield _format_sse(event["event"], event["data"])
+        except Exception as e:
+            print(
+                f"Failed to stream insights for document '{document_id}' \n Exception : {e}"
+            )
+            yield _format_sse("error", {"error": f"{type(e).__name__}: {e}"})
+        finally:
+            release_slot()
+
+    # The background task frees the slot if the stream never started
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release_slot),
+    )
+
+
+@app.get("/jobs/{job_id}")
+def get_job_endpoint(job_id: UUID):
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"No job found with id '{job_id}'")
+    return job
+
+
 @app.get("/product/insights")
 def get_insights_endpoint(project_id: UUID, release_id: UUID, document_id: UUID = None):
     return get_insights(project_id, release_id, document_id)
@@ -222,7 +519,7 @@ def create_concerns_endpoint(req_body: CreateProductConcernRequest):
             questions=concern.questions,
             raised_by=concern.raised_by,
             status=concern.status,
-            source_document=concern.source_document,
+            source_document=concern.source_document or req_body.document_id,
         )
         for concern in req_body.concerns
     ]
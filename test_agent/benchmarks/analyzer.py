@@ -0,0 +1,181 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from uuid6 import uuid7
+from langchain_core.documents import Document
+from test_agent import config
+from test_agent.agents.prd_agent.prd_analyzer_agent import PrdAnalyzerAgent
+from test_agent.benchmarks.fake_llm import FakeChatModel
+from test_agent.benchmarks.synthetic import generate_prd
+from test_agent.db.connection import close_connection
+from test_agent.db.repositories.document import (
+    create_document,
+    create_document_chunks,
+    get_documents_by_ids,
+)
+from test_agent.db.setup import initialize_db, default_projects, default_releases
+from test_agent.llm.model_manager import ModelManager
+from test_agent.schemas.agent_schemas.prd_agent_schemas import (
+    PrdAnalyzerAgentState,
+    PrdDocument,
+)
+from test_agent.services.document_service import _chunk_markdown_document
+from test_agent.services.product_service import _persist_findings
+
+PROJECT_ID = default_projects[0][0]
+RELEASE_ID = default_releases[0][0]
+
+
+def _ingest_document(feature_count: int, seed: int) -> dict:
+    markdown_prd = generate_prd(feature_count, seed)
+    document_id = create_document(
+        project_id=PROJECT_ID,
+        document_type="PRD",
+        content=markdown_prd,
+        document_hash=f"analyzer-benchmark-{feature_count}-{uuid7()}",
+        document_status="APPROVED",
+        release_id=RELEASE_ID,
+    )
+    create_document_chunks(
+        document_id,
+        [chunk.page_content for chunk in _chunk_markdown_document(markdown_prd)],
+    )
+    return get_documents_by_ids([document_id], include_chunks=True)[0]
+
+
+async def _analyse_document(loaded_doc: dict) -> dict:
+    # Mirrors product_service.astream_document_insights for a first revision, timing the
+    # incremental DB writes separately from the graph
+    state = PrdAnalyzerAgentState(
+        project_id=str(PROJECT_ID),
+        release_id=str(RELEASE_ID),
+        document=PrdDocument(
+            id=loaded_doc["id"],
+            hash=loaded_doc["hash"],
+            page_content=loaded_doc["content"],
+            chunks=[
+                Document(chunk["content"], id=chunk["id"])
+                for chunk in loaded_doc["chunks"]
+            ],
+        ),
+    )
+    db_write_seconds = 0.0
+    source_chunk_hashes = {}
+    result = None
+    started_at = time.perf_counter()
+    async for event in PrdAnalyzerAgent().astream(state):
+        if event["event"] == "result":
+            result = event["data"]
+            continue
+        write_started_at = time.perf_counter()
+        await _persist_findings(
+            event, loaded_doc, PROJECT_ID, RELEASE_ID, source_chunk_hashes
+        )
+        db_write_seconds += time.perf_counter() - write_started_at
+    return {
+        "end_to_end_seconds": time.perf_counter() - started_at,
+        "db_write_seconds": db_write_seconds,
+        "result": result,
+    }
+
+
+def run_benchmark(
+    feature_counts: list[int],
+    fake_llm: FakeChatModel,
+    measure_memory: bool = True,
+    seed: int = 0,
+) -> list[dict]:
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        original_db = config.RELATIONAL_DB_NAME
+        config.RELATIONAL_DB_NAME = Path(tmp_dir) / "analyzer_benchmark.sqlite3"
+        ModelManager.set_instance_override(fake_llm)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                initialize_db()
+            for feature_count in feature_counts:
+                loaded_doc = _ingest_document(feature_count, seed)
+                fake_llm.stats.reset()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    run = asyncio.run(_analyse_document(loaded_doc))
+                llm_busy_seconds = fake_llm.stats.busy_seconds()
+                row = {
+                    "features": feature_count,
+                    "chunks": len(loaded_doc["chunks"]),
+                    "llm_calls": fake_llm.stats.calls,
+                    "input_tokens": fake_llm.stats.input_tokens,
+                    "insights": len(run["result"]["insights"]),
+                    "end_to_end_s": run["end_to_end_seconds"],
+                    "llm_busy_s": llm_busy_seconds,
+                    "db_write_s": run["db_write_seconds"],
+                    # Time no fake LLM call was in flight and nothing was being written
+                    "graph_overhead_s": run["end_to_end_seconds"]
+                    - llm_busy_seconds
+                    - run["db_write_seconds"],
+                }
+
+                if measure_memory:
+                    # Separate zero-latency pass: tracemalloc slows the timed run down
+                    latency_seconds = fake_llm.latency_seconds
+                    fake_llm.latency_seconds = 0.0
+                    tracemalloc.start()
+                    try:
+                        with contextlib.redirect_stdout(io.StringIO()):
+                            asyncio.run(_analyse_document(loaded_doc))
+                        row["peak_memory_mb"] = (
+                            tracemalloc.get_traced_memory()[1] / 1024 / 1024
+                        )
+                    finally:
+                        tracemalloc.stop()
+                        fake_llm.latency_seconds = latency_seconds
+                results.append(row)
+        finally:
+            ModelManager.set_instance_override(None)
+            close_connection()
+            config.RELATIONAL_DB_NAME = original_db
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the PRD analyzer graph offline with a scripted fake LLM"
+    )
+    parser.add_argument("--features", type=int, nargs="+", default=[5, 20, 50])
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--insights-per-call", type=int, default=2)
+    parser.add_argument("--concerns-per-call", type=int, default=1)
+    parser.add_argument("--delete-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-memory", action="store_true")
+    args = parser.parse_args()
+
+    fake_llm = FakeChatModel(
+        latency_seconds=args.latency,
+        insights_per_call=args.insights_per_call,
+        concerns_per_call=args.concerns_per_call,
+        delete_ratio=args.delete_ratio,
+    )
+    results = run_benchmark(
+        args.features, fake_llm, measure_memory=not args.skip_memory, seed=args.seed
+    )
+
+    columns = list(results[0].keys())
+    print(" | ".join(f"{column:>16}" for column in columns))
+    for row in results:
+        print(
+            " | ".join(
+                f"{row[column]:>16,.3f}" if isinstance(row[column], float) else f"{row[column]:>16,}"
+                for column in columns
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+import argparse
+import asyncio
+import base64
+import contextlib
+import io
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+import httpx
+from uuid6 import uuid7
+from test_agent import config
+from test_agent.benchmarks.fake_llm import FakeChatModel
+from test_agent.benchmarks.synthetic import generate_insights, generate_prd
+from test_agent.db.connection import close_all_connections
+from test_agent.db.repositories.document import create_document
+from test_agent.db.repositories.product import create_concerns, create_insights
+from test_agent.db.setup import initialize_db, default_projects, default_releases
+from test_agent.llm.model_manager import ModelManager
+
+PROJECT_ID = default_projects[0][0]
+RELEASE_ID = default_releases[0][0]
+DEFAULT_SLO_PATH = Path(__file__).with_name("api_slo.json")
+
+# Relative weight of every operation in the mixed workload
+WORKLOAD = {
+    "GET /product/insights": 30,
+    "GET /product/concerns": 30,
+    "POST /product/insights": 10,
+    "POST /product/concerns": 10,
+    "PATCH /product/insight/{insight_id}": 8,
+    "PATCH /product/concern/{concern_id}": 8,
+    "POST /document/upload": 4,
+}
+
+
+def _seed_database(feature_count: int) -> dict:
+    # One document with `feature_count` features worth of insights and concerns
+    document_id = create_document(
+        project_id=PROJECT_ID,
+        document_type="PRD",
+        content=generate_prd(feature_count),
+        document_hash=f"api-load-{uuid7()}",
+        document_status="APPROVED",
+        release_id=RELEASE_ID,
+    )
+    insights, concerns = generate_insights(feature_count)
+    return {
+        "document_id": document_id,
+        "insight_ids": create_insights(PROJECT_ID, RELEASE_ID, document_id, insights),
+        "concern_ids": create_concerns(PROJECT_ID, RELEASE_ID, document_id, concerns),
+    }
+
+
+def _build_request(operation: str, seed_data: dict, rng: random.Random, upload: str):
+
+    scope = {"project_id": PROJECT_ID, "release_id": RELEASE_ID}
+    if operation in ("GET /product/insights", "GET /product/concerns"):
+        return "GET", operation.split(" ")[1], {"params": scope}
+    if operation == "POST /product/insights":
+        feature = rng.randint(0, 9999)
+        return "POST", "/product/insights", {
+            "json": {
+                **scope,
+                "document_id": str(seed_data["document_id"]),
+                "insights": [
+                    {
+                        "title": f"Load test insight {feature}",
+                        "description": f"User can complete load test flow {feature}",
+                        "flow_type": "user_flow",
+                        "priority": "P2",
+                        "expected_outcomes": [f"Flow {feature} is completed"],
+                    }
+                ],
+            }
+        }
+    if operation == "POST /product/concerns":
+        return "POST", "/product/concerns", {
+            "json": {
+                **scope,
+                "document_id": str(seed_data["document_id"]),
+                "concerns": [
+                    {
+                        "type": "ambiguity",
+                        "severity": "LOW",
+                        "description": f"Load test concern {rng.randint(0, 9999)}",
+                    }
+                ],
+            }
+        }
+    if operation == "PATCH /product/insight/{insight_id}":
+        insight_id = rng.choice(seed_data["insight_ids"])
+        return "PATCH", f"/product/insight/{insight_id}", {
+            "json": {"priority": rng.choice(["P1", "P2", "P3"])}
+        }
+    if operation == "PATCH /product/concern/{concern_id}":
+        concern_id = rng.choice(seed_data["concern_ids"])
+        return "PATCH", f"/product/concern/{concern_id}", {
+            "json": {"severity": rng.choice(["LOW", "MEDIUM", "HIGH"])}
+        }
+    if operation == "POST /document/upload":
+        return "POST", "/document/upload", {
+            "json": {
+                **scope,
+                "document": {"document_type": "PRD", "document_content_base64": upload},
+            }
+        }
+    raise ValueError(f"Unknown load test operation '{operation}'")
+
+
+def _percentile(latencies: list[float], percentile: int) -> float:
+    if len(latencies) < 2:
+        return latencies[0] if latencies else 0.0
+    return statistics.quantiles(latencies, n=100, method="inclusive")[percentile - 1]
+
+
+async def _run_level(
+    client: httpx.AsyncClient,
+    concurrency: int,
+    request_count: int,
+    seed_data: dict,
+    seed: int,
+    upload: str,
+) -> dict:
+
+    rng = random.Random(seed + concurrency)
+    operations = rng.choices(
+        list(WORKLOAD.keys()), weights=list(WORKLOAD.values()), k=request_count
+    )
+    requests = [
+        (operation, *_build_request(operation, seed_data, rng, upload))
+        for operation in operations
+    ]
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    next_request = iter(requests)
+
+    async def worker():
+        for operation, method, url, kwargs in next_request:
+            started_at = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies[operation].append((time.perf_counter() - started_at) * 1000)
+            if failed:
+                errors[operation] += 1
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed_seconds = time.perf_counter() - started_at
+
+    endpoints = {
+        operation: {
+            "requests": len(operation_latencies),
+            "errors": errors[operation],
+            "error_rate": errors[operation] / len(operation_latencies),
+            "rps": len(operation_latencies) / elapsed_seconds,
+            "p50_ms": _percentile(operation_latencies, 50),
+            "p95_ms": _percentile(operation_latencies, 95),
+            "p99_ms": _percentile(operation_latencies, 99),
+        }
+        for operation, operation_latencies in sorted(latencies.items())
+    }
+    return {
+        "concurrency": concurrency,
+        "requests": request_count,
+        "elapsed_seconds": elapsed_seconds,
+        "rps": request_count / elapsed_seconds,
+        "endpoints": endpoints,
+    }
+
+
+async def _run_levels(
+    base_url: str | None,
+    concurrency_levels: list[int],
+    request_count: int,
+    seed_data: dict,
+    seed: int,
+    upload: str,
+) -> list[dict]:
+
+    if base_url:
+        transport = None
+    else:
+        # In-process ASGI client; the lifespan (job workers) is not started, so uploads
+        # are only enqueued and never converted
+        from test_agent.api.routes import app
+
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(
+        transport=transport, base_url=base_url or "http://load-test", timeout=60
+    ) as client:
+        return [
+            await _run_level(
+                client, concurrency, request_count, seed_data, seed, upload
+            )
+            for concurrency in concurrency_levels
+        ]
+
+
+def run_load_test(
+    concurrency_levels: list[int],
+    request_count: int,
+    feature_count: int = 100,
+    upload_kb: int = 64,
+    seed: int = 0,
+    base_url: str = None,
+) -> list[dict]:
+
+    upload = base64.b64encode(random.Random(seed).randbytes(upload_kb * 1024)).decode()
+    if base_url:
+        # The server owns its database; seed it through the same repositories beforehand
+        seed_data = _seed_database(feature_count)
+        return asyncio.run(
+            _run_levels(
+                base_url, concurrency_levels, request_count, seed_data, seed, upload
+            )
+        )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        original_db, original_uploads = config.RELATIONAL_DB_NAME, config.UPLOADS_DIR
+        original_queue_size = config.CONVERSION_QUEUE_SIZE
+        config.RELATIONAL_DB_NAME = Path(tmp_dir) / "api_load.sqlite3"
+        config.UPLOADS_DIR = Path(tmp_dir) / "uploads"
+        # No ingest workers drain the queue in-process, so it must not fill up mid-run
+        config.CONVERSION_QUEUE_SIZE = request_count * len(concurrency_levels)
+        # Nothing under test should reach an LLM provider
+        ModelManager.set_instance_override(FakeChatModel(latency_seconds=0.0))
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                initialize_db()
+            seed_data = _seed_database(feature_count)
+            return asyncio.run(
+                _run_levels(
+                    None, concurrency_levels, request_count, seed_data, seed, upload
+                )
+            )
+        finally:
+            ModelManager.set_instance_override(None)
+            close_all_connections()
+            config.RELATIONAL_DB_NAME, config.UPLOADS_DIR = original_db, original_uploads
+            config.CONVERSION_QUEUE_SIZE = original_queue_size
+
+
+def check_slo(results: list[dict], slo: dict) -> list[str]:
+    # Every endpoint threshold applies at every concurrency level of the run
+    violations = []
+    for level in results:
+        for operation, thresholds in slo["endpoints"].items():
+            metrics = level["endpoints"].get(operation)
+            if metrics is None:
+                continue
+            for metric in ("p50_ms", "p95_ms", "p99_ms", "error_rate"):
+                limit = thresholds.get(f"max_{metric}")
+                if limit is not None and metrics[metric] > limit:
+                    violations.append(
+                        f"{operation} @ concurrency {level['concurrency']}: {metric} "
+                        f"{metrics[metric]:.3f} > {limit}"
+                    )
+        min_rps = slo.get("min_total_rps")
+        if min_rps is not None and level["rps"] < min_rps:
+            violations.append(
+                f"total @ concurrency {level['concurrency']}: rps {level['rps']:.1f} < {min_rps}"
+            )
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mixed read/write load test of the API with p50/p95/p99 and rps per endpoint"
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--features", type=int, default=100)
+    parser.add_argument("--upload-kb", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--base-url", help="Target a running server instead of the in-process app"
+    )
+    parser.add_argument("--slo", type=Path, default=DEFAULT_SLO_PATH)
+    parser.add_argument("--output", type=Path, help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    results = run_load_test(
+        args.concurrency,
+        args.requests,
+        feature_count=args.features,
+        upload_kb=args.upload_kb,
+        seed=args.seed,
+        base_url=args.base_url,
+    )
+
+    columns = ["requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms"]
+    for level in results:
+        print(
+            f"\nconcurrency {level['concurrency']} - {level['requests']} requests in "
+            f"{level['elapsed_seconds']:.2f}s ({level['rps']:.1f} req/s)"
+        )
+        print(f"{'endpoint':>38} | " + " | ".join(f"{column:>9}" for column in columns))
+        for operation, metrics in level["endpoints"].items():
+            print(
+                f"{operation:>38} | "
+                + " | ".join(
+                    f"{metrics[column]:>9,.1f}" if isinstance(metrics[column], float) else f"{metrics[column]:>9}"
+                    for column in columns
+                )
+            )
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    violations = check_slo(results, json.loads(args.slo.read_text()))
+    if violations:
+        print(f"\n{len(violations)} SLO violations ({args.slo}):")
+        for violation in violations:
+            print(f"  {violation}")
+        sys.exit(1)
+    print(f"\nAll SLOs met ({args.slo})")
+
+
+if __name__ == "__main__":
+    main()
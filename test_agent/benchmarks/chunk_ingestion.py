@@ -0,0 +1,123 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from uuid6 import uuid7
+from test_agent import config
+from test_agent.db.connection import get_connection, close_connection
+from test_agent.db.setup import initialize_db, default_projects, default_releases
+from test_agent.db.repositories.document import create_document, create_document_chunks
+
+PROJECT_ID = default_projects[0][0]
+RELEASE_ID = default_releases[0][0]
+
+
+def _generate_chunks(size: int, revision: int = 0) -> list[str]:
+    return [
+        f"## Section {index}\n\nRequirement {index} (revision {revision if index % 10 == 0 else 0}): "
+        + "The system shall behave as described in this section. " * 8
+        for index in range(size)
+    ]
+
+
+def _legacy_create_document_chunks(document_id, chunks: list[str]):
+    # Previous behaviour: one SELECT + one INSERT OR REPLACE + one commit per chunk
+    for index, chunk_content in enumerate(chunks):
+        with get_connection() as conn:
+            chunk_id = uuid7()
+            result = conn.execute(
+                """SELECT * from document_chunk WHERE document_id = ? AND chunk_index = ?""",
+                (str(document_id), index),
+            ).fetchone()
+            if result:
+                chunk_id = result[0]
+            conn.execute(
+                """INSERT OR REPLACE INTO document_chunk (id, document_id, chunk_index, content)
+                VALUES (?,?,?,?)""",
+                (str(chunk_id), str(document_id), index, chunk_content),
+            )
+
+
+def _measure(fn, document_id, chunks) -> float:
+    start = time.perf_counter()
+    fn(document_id, chunks)
+    elapsed = time.perf_counter() - start
+    return len(chunks) / elapsed if elapsed else float("inf")
+
+
+def run_benchmark(sizes: list[int], include_legacy: bool = True) -> list[dict]:
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        original_db = config.RELATIONAL_DB_NAME
+        config.RELATIONAL_DB_NAME = Path(tmp_dir) / "chunk_ingestion_benchmark.sqlite3"
+        try:
+            initialize_db()
+            for size in sizes:
+                document_id = create_document(
+                    project_id=PROJECT_ID,
+                    document_type="PRD",
+                    content="benchmark",
+                    document_hash=f"chunk-benchmark-{size}-{uuid7()}",
+                    document_status="APPROVED",
+                    release_id=RELEASE_ID,
+                )
+                row = {
+                    "chunks": size,
+                    "insert": _measure(
+                        create_document_chunks, document_id, _generate_chunks(size)
+                    ),
+                    "reingest_unchanged": _measure(
+                        create_document_chunks, document_id, _generate_chunks(size)
+                    ),
+                    "reingest_10pct_modified": _measure(
+                        create_document_chunks, document_id, _generate_chunks(size, 1)
+                    ),
+                }
+                if include_legacy:
+                    legacy_document_id = create_document(
+                        project_id=PROJECT_ID,
+                        document_type="PRD",
+                        content="benchmark",
+                        document_hash=f"chunk-benchmark-legacy-{size}-{uuid7()}",
+                        document_status="APPROVED",
+                        release_id=RELEASE_ID,
+                    )
+                    row["legacy_insert"] = _measure(
+                        _legacy_create_document_chunks,
+                        legacy_document_id,
+                        _generate_chunks(size),
+                    )
+                results.append(row)
+        finally:
+            close_connection()
+            config.RELATIONAL_DB_NAME = original_db
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure document chunk ingestion throughput (chunks/sec)"
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.sizes, include_legacy=not args.skip_legacy)
+
+    columns = ["chunks", "insert", "reingest_unchanged", "reingest_10pct_modified"]
+    if not args.skip_legacy:
+        columns.append("legacy_insert")
+    print(" | ".join(f"{column:>24}" for column in columns))
+    for row in results:
+        print(
+            " | ".join(
+                f"{row[column]:>24}" if column == "chunks" else f"{row[column]:>24,.0f}"
+                for column in columns
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import asyncio
+import hashlib
+import random
+import re
+import threading
+import time
+from typing import Any, List
+from pydantic import Field
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatResult
+from test_agent.benchmarks.synthetic import _ACTIONS, _ACTORS, _OBJECTS
+
+_UUID_PATTERN = re.compile(
+    r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+)
+
+
+class FakeLlmStats:
+    # Shared by every bind_tools copy of a FakeChatModel
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.tool_calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.intervals: List[tuple[float, float]] = []
+
+    def record(self, started_at: float, message: AIMessage):
+        with self._lock:
+            self.calls += 1
+            self.tool_calls += len(message.tool_calls)
+            self.input_tokens += message.usage_metadata["input_tokens"]
+            self.output_tokens += message.usage_metadata["output_tokens"]
+            self.intervals.append((started_at, time.perf_counter()))
+
+    def busy_seconds(self) -> float:
+        # Wall time during which at least one fake LLM call was in flight
+        busy_seconds, busy_until = 0.0, float("-inf")
+        with self._lock:
+            intervals = sorted(self.intervals)
+        for started_at, ended_at in intervals:
+            if ended_at <= busy_until:
+                continue
+            busy_seconds += ended_at - max(started_at, busy_until)
+            busy_until = ended_at
+        return busy_seconds
+
+    def reset(self):
+        with self._lock:
+            self.calls = self.tool_calls = self.input_tokens = self.output_tokens = 0
+            self.intervals = []
+
+
+class FakeChatModel(BaseChatModel):
+    # Scripted chat model for offline benchmarks: answers every bound add_* tool with
+    # `insights_per_call` / `concerns_per_call` tool calls and deletes `delete_ratio` of
+    # the ids it is shown by the deduplication prompt. Output is seeded by the prompt,
+    # so the same prompt always produces the same tool calls.
+
+    latency_seconds: float = 0.5
+    insights_per_call: int = 2
+    concerns_per_call: int = 1
+    delete_ratio: float = 0.1
+    output_tokens_per_tool_call: int = 60
+    tool_names: List[str] = Field(default_factory=list)
+    stats: FakeLlmStats = Field(default_factory=FakeLlmStats)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark-chat-model"
+
+    def bind_tools(self, tools: List[Any], **kwargs: Any) -> "FakeChatModel":
+        return self.model_copy(update={"tool_names": [tool.name for tool in tools]})
+
+    def _tool_calls(self, prompt: str) -> List[dict]:
+
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        tool_calls = []
+        if "add_product_insight" in self.tool_names:
+            for _ in range(self.insights_per_call):
+                action, feature_object = rng.choice(_ACTIONS), rng.choice(_OBJECTS)
+                feature_index = rng.randint(0, 999)
+                tool_calls.append(
+                    {
+                        "name": "add_product_insight",
+                        "args": {
+                            "id": "generated",
+                            "title": f"{action.title()} {feature_object} {feature_index}",
+                            "description": f"The {rng.choice(_ACTORS)} can {action} a {feature_object} {feature_index} "
+                            f"and sees it confirmed within {rng.randint(1, 5)} seconds",
+                            "flow_type": "user_flow",
+                            "priority": rng.choice(["P1", "P2", "P3"]),
+                            "expected_outcomes": [f"The {feature_object} is persisted"],
+                        },
+                    }
+                )
+        if "add_concern" in self.tool_names:
+            for _ in range(self.concerns_per_call):
+                tool_calls.append(
+                    {
+                        "name": "add_concern",
+                        "args": {
+                            "id": "generated",
+                            "type": "ambiguity",
+                            "severity": rng.choice(["LOW", "MEDIUM", "HIGH"]),
+                            "description": f"Bulk {rng.choice(_ACTIONS)} of {rng.choice(_OBJECTS)} "
+                            f"{rng.randint(0, 999)} is not specified",
+                        },
+                    }
+                )
+        if "delete_product_insight" in self.tool_names:
+            # Insight and concern ids are not told apart; deleting an unknown id is a no-op
+            for item_id in _UUID_PATTERN.findall(prompt):
+                if rng.random() < self.delete_ratio:
+                    tool_calls.append(
+                        {"name": "delete_product_insight", "args": {"insight_id": item_id}}
+                    )
+        for index, tool_call in enumerate(tool_calls):
+            tool_call["id"] = f"call_{index}"
+        return tool_calls
+
+    def _respond(self, messages: List[BaseMessage]) -> tuple[AIMessage, ChatResult]:
+
+        tool_calls = self._tool_calls("\n".join(str(m.content) for m in messages))
+        input_tokens = count_tokens_approximately(messages)
+        output_tokens = self.output_tokens_per_tool_call * max(1, len(tool_calls))
+        message = AIMessage(
+            content="",
+            tool_calls=tool_calls,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+        return message, ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs):
+        started_at = time.perf_counter()
+        time.sleep(self.latency_seconds)
+        message, result = self._respond(messages)
+        self.stats.record(started_at, message)
+        return result
+
+    async def _agenerate(
+        self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs
+    ):
+        started_at = time.perf_counter()
+        await asyncio.sleep(self.latency_seconds)
+        message, result = self._respond(messages)
+        self.stats.record(started_at, message)
+        return result
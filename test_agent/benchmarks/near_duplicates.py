@@ -0,0 +1,80 @@
+import argparse
+import time
+from test_agent import config
+from test_agent.agents.prd_agent.near_duplicates import (
+    find_near_duplicates,
+    jaccard_similarity,
+    shingles,
+    _item_text,
+)
+from test_agent.benchmarks.synthetic import generate_insights
+
+
+def brute_force_duplicates(items: list) -> set:
+    # Every pairwise Jaccard similarity; the later item of a duplicate pair is deleted
+    items_shingles = [shingles(_item_text(item)) for item in items]
+    duplicates = set()
+    for first in range(len(items)):
+        for second in range(first + 1, len(items)):
+            if (
+                jaccard_similarity(items_shingles[first], items_shingles[second])
+                >= config.NEAR_DUPLICATE_THRESHOLD
+            ):
+                duplicates.add(items[second].id)
+    return duplicates
+
+
+def run_benchmark(feature_count: int, insights_per_feature: int) -> dict:
+
+    insights, _ = generate_insights(feature_count, insights_per_feature)
+    # Every variant of a feature rephrases the same insight, so all but one are duplicates
+    expected_duplicates = feature_count * (insights_per_feature - 1)
+    insight_features = {insight.id: insight.title for insight in insights}
+
+    started_at = time.perf_counter()
+    result = find_near_duplicates(insights)
+    lsh_seconds = time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    brute_force = brute_force_duplicates(insights)
+    brute_force_seconds = time.perf_counter() - started_at
+
+    duplicate_ids = {insight.id for insight in result["duplicates"]}
+    kept_features = [
+        insight_features[insight.id]
+        for insight in insights
+        if insight.id not in duplicate_ids
+    ]
+    true_positives = expected_duplicates - (len(kept_features) - len(set(kept_features)))
+    return {
+        "insights": len(insights),
+        "expected_duplicates": expected_duplicates,
+        "lsh_duplicates": len(result["duplicates"]),
+        "brute_force_duplicates": len(brute_force),
+        "ambiguous_for_llm": len(result["ambiguous"]),
+        "precision": true_positives / len(result["duplicates"]) if result["duplicates"] else 1.0,
+        "recall": true_positives / expected_duplicates if expected_duplicates else 1.0,
+        "lsh_seconds": lsh_seconds,
+        "brute_force_seconds": brute_force_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare MinHash/LSH near-duplicate detection with brute-force Jaccard"
+    )
+    parser.add_argument("--features", type=int, default=500)
+    parser.add_argument("--insights-per-feature", type=int, default=2)
+    args = parser.parse_args()
+
+    results = run_benchmark(args.features, args.insights_per_feature)
+    for name, value in results.items():
+        print(f"{name:>24}: {value:,.3f}" if isinstance(value, float) else f"{name:>24}: {value:,}")
+    print(
+        f"LSH is {results['brute_force_seconds'] / results['lsh_seconds']:.1f}x faster "
+        "than brute-force pairwise Jaccard"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+from uuid6 import uuid7
+from langchain_core.messages.utils import count_tokens_approximately
+from test_agent.agents.prd_agent.prd_analyzer_agent import PrdAnalyzerAgent
+from test_agent.agents.prd_agent.chunk_level_insights_validator_agent import (
+    InsightsValidatorAgent,
+)
+from test_agent.benchmarks.synthetic import generate_prd, generate_insights
+from test_agent.schemas.agent_schemas.prd_agent_schemas import (
+    PrdAnalyzerAgentState,
+    PrdDocument,
+)
+from test_agent.services.document_service import _chunk_markdown_document
+
+
+def measure_prompt_tokens(state: PrdAnalyzerAgentState, context_mode: str) -> dict:
+    # Builds every chunk validator prompt exactly as the graph would, without calling an LLM
+    state = state.model_copy(
+        update={"config": {"CHUNK_VALIDATION_CONTEXT_MODE": context_mode}}
+    )
+    validator = InsightsValidatorAgent()
+    prompt_tokens = []
+    for send in PrdAnalyzerAgent().build_chunk_validation_sends(state):
+        prompt_template, prompt_inputs = validator.build_prompt(send.arg)
+        prompt_tokens.append(
+            count_tokens_approximately(prompt_template.format_messages(**prompt_inputs))
+        )
+    return {
+        "mode": context_mode,
+        "chunks": len(prompt_tokens),
+        "total_tokens": sum(prompt_tokens),
+        "max_tokens": max(prompt_tokens),
+        "avg_tokens": sum(prompt_tokens) / len(prompt_tokens),
+    }
+
+
+def run_benchmark(feature_count: int, insights_per_feature: int) -> list[dict]:
+
+    markdown_prd = generate_prd(feature_count)
+    insights, concerns = generate_insights(feature_count, insights_per_feature)
+    document = PrdDocument(
+        id=uuid7(),
+        hash="prompt-token-benchmark",
+        page_content=markdown_prd,
+        chunks=_chunk_markdown_document(markdown_prd),
+    )
+    state = PrdAnalyzerAgentState(
+        project_id="prompt-token-benchmark",
+        release_id="prompt-token-benchmark",
+        document=document,
+        insights=insights,
+        concerns=concerns,
+    )
+    return [measure_prompt_tokens(state, mode) for mode in ("FULL", "WINDOWED")]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare chunk validation prompt tokens for FULL vs WINDOWED context"
+    )
+    parser.add_argument("--features", type=int, default=50)
+    parser.add_argument("--insights-per-feature", type=int, default=2)
+    args = parser.parse_args()
+
+    results = run_benchmark(args.features, args.insights_per_feature)
+
+    columns = ["mode", "chunks", "total_tokens", "max_tokens", "avg_tokens"]
+    print(" | ".join(f"{column:>14}" for column in columns))
+    for row in results:
+        print(
+            " | ".join(
+                f"{row[column]:>14}" if column in ("mode", "chunks") else f"{row[column]:>14,.0f}"
+                for column in columns
+            )
+        )
+    full_tokens, windowed_tokens = results[0]["total_tokens"], results[1]["total_tokens"]
+    print(f"WINDOWED uses {windowed_tokens / full_tokens:.1%} of the FULL prompt tokens")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import random
+from typing import List, Tuple
+from uuid6 import uuid7
+from test_agent.schemas.agent_schemas.prd_agent_schemas import (
+    ProductInsight,
+    ProductConcern,
+)
+
+_ACTIONS = ["create", "export", "approve", "archive", "share", "schedule", "import", "audit"]
+_OBJECTS = ["invoice", "report", "workspace", "payment", "subscription", "dashboard", "ticket", "catalog"]
+_ACTORS = ["admin", "customer", "finance manager", "support agent", "auditor"]
+
+
+def _feature_names(feature_count: int, seed: int) -> List[Tuple[str, str]]:
+    rng = random.Random(seed)
+    return [
+        (rng.choice(_ACTIONS), f"{rng.choice(_OBJECTS)} {index}")
+        for index in range(feature_count)
+    ]
+
+
+def generate_prd(feature_count: int, seed: int = 0) -> str:
+    # Markdown PRD with one H2 per feature and H3 flow / criteria / question subsections
+    rng = random.Random(seed)
+    sections = [
+        "# Synthetic Product Requirement Document",
+        "This document describes the synthetic product used for benchmarking.",
+    ]
+    for action, feature_object in _feature_names(feature_count, seed):
+        actor = rng.choice(_ACTORS)
+        sections.extend(
+            [
+                f"## Feature: {action.title()} {feature_object}",
+                f"The {actor} can {action} a {feature_object} from the main navigation.",
+                "### User Flow",
+                "\n".join(
+                    f"{step}. The {actor} {action}s the {feature_object} and the system "
+                    f"confirms step {step} with a notification."
+                    for step in range(1, rng.randint(3, 6))
+                ),
+                "### Acceptance Criteria",
+                "\n".join(
+                    f"- The {feature_object} is persisted within {rng.randint(1, 5)} seconds "
+                    f"and visible to every {rng.choice(_ACTORS)}."
+                    for _ in range(rng.randint(2, 4))
+                ),
+                "### Open Questions",
+                f"- Should the {actor} be able to {action} a {feature_object} in bulk?",
+            ]
+        )
+    return "\n\n".join(sections)
+
+
+def generate_insights(
+    feature_count: int, insights_per_feature: int = 2, seed: int = 0
+) -> Tuple[List[ProductInsight], List[ProductConcern]]:
+
+    insights = []
+    concerns = []
+    for action, feature_object in _feature_names(feature_count, seed):
+        for variant in range(insights_per_feature):
+            insights.append(
+                ProductInsight(
+                    id=uuid7(),
+                    title=f"{action.title()} {feature_object}",
+                    description=f"User can {action} a {feature_object} and receives confirmation (variant {variant})",
+                    flow_type="user_flow",
+                    priority="P2",
+                    expected_outcomes=[f"The {feature_object} is persisted"],
+                )
+            )
+        concerns.append(
+            ProductConcern(
+                id=uuid7(),
+                type="ambiguity",
+                severity="MEDIUM",
+                description=f"Bulk {action} of {feature_object} is not specified",
+            )
+        )
+    return insights, concerns
@@ -12,14 +12,108 @@ DATA_DIR.mkdir(parents=True, exist_ok=True)
 SUPPORTED_LLM_PLATFORMS = ["ollama", "gemini"]
 DEFAULT_LLM_PLATFORM = "gemini" if is_prod else "ollama"
 DEFAULT_LLM_MODELS = {"ollama": "qwen3:8b", "gemini": "gemini-2.5-flash", "gpt": "gpt-4o-mini"}
+## Client-side request rate per platform (None = unlimited)
+LLM_RATE_LIMITS = {
+    "ollama": None,
+    "gemini": {"requests_per_second": 2, "max_bucket_size": 10},
+    "gpt": {"requests_per_second": 5, "max_bucket_size": 20},
+}
+## Concurrent in-flight LLM calls per platform (shrinks adaptively on 429s)
+LLM_MAX_CONCURRENCY = {"ollama": 2, "gemini": 16, "gpt": 16}
+LLM_THROTTLE_POLL_SECONDS = 0.05
+LLM_RATE_LIMIT_MAX_RETRIES = 5
+LLM_RATE_LIMIT_BACKOFF_SECONDS = 2
+LLM_RATE_LIMIT_MAX_BACKOFF_SECONDS = 60
+## Keeps the Ollama model (and its KV cache of the shared PRD prefix) loaded between calls
+OLLAMA_KEEP_ALIVE = "30m"
+## Disk-backed LLM response cache (key = platform, model, bound tools, rendered messages)
+LLM_RESPONSE_CACHE_ENABLED = os.getenv("LLM_RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+LLM_RESPONSE_CACHE_DB_NAME = DATA_DIR / "llm_response_cache.sqlite3"
+LLM_RESPONSE_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+LLM_RESPONSE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+## Per-node graph instrumentation (Prometheus metrics + optional per-run JSON trace files)
+NODE_TRACE_ENABLED = os.getenv("NODE_TRACE_ENABLED", "false").lower() == "true"
+NODE_TRACE_DIR = DATA_DIR / "traces"
+NODE_LATENCY_BUCKETS_SECONDS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+## Document Conversion
+CONVERSION_CACHE_DIR = DATA_DIR / "conversion_cache"
+CONVERSION_CACHE_MAX_BYTES = 512 * 1024 * 1024
+## Temporary cache files older than this are removed during eviction
+CONVERSION_CACHE_TMP_MAX_AGE_SECONDS = 60 * 60
+CONVERSION_WORKER_COUNT = int(
+    os.getenv("CONVERSION_WORKER_COUNT", max(1, (os.cpu_count() or 2) // 2))
+)
+## Pending + running INGEST_DOCUMENT jobs accepted before uploads are answered with 503
+CONVERSION_QUEUE_SIZE = CONVERSION_WORKER_COUNT * 4
 
 ## PRD Agent
 MAX_REFLECTION_COUNT = 2
+## Reflection stops early once a round adds nothing, adds fewer new items than this
+## share of the existing ones, or the per-document budget is spent
+REFLECTION_MIN_MARGINAL_YIELD = 0.05
+REFLECTION_TOKEN_BUDGET = 200_000
+REFLECTION_TIME_BUDGET_SECONDS = 300
+## Local MinHash / LSH near-duplicate detection run before the LLM deduplication:
+## pairs at or above NEAR_DUPLICATE_THRESHOLD (shingled Jaccard) are merged locally,
+## pairs between the two thresholds are left to the LLM. The LSH bands x rows layout is
+## derived so a pair at the ambiguous threshold becomes a candidate with at least
+## NEAR_DUPLICATE_LSH_MIN_RECALL probability (32 bands of 4 rows for the defaults)
+NEAR_DUPLICATE_SHINGLE_SIZE = 2
+NEAR_DUPLICATE_NUM_PERMUTATIONS = 128
+NEAR_DUPLICATE_THRESHOLD = 0.8
+NEAR_DUPLICATE_AMBIGUOUS_THRESHOLD = 0.5
+NEAR_DUPLICATE_LSH_MIN_RECALL = 0.85
+## Candidates whose MinHash estimate is below the ambiguous threshold by more than this
+## margin (about 3 standard deviations with 128 permutations) skip the exact Jaccard
+NEAR_DUPLICATE_ESTIMATE_MARGIN = 0.15
+NEAR_DUPLICATE_ESTIMATE_BATCH_SIZE = 100_000
+INSIGHT_GENERATION_MAX_CONCURRENCY = 4
+CHUNK_VALIDATION_MAX_CONCURRENCY = 32
+## "FULL" sends the whole PRD with every chunk, "WINDOWED" only the chunk's header path,
+## its neighbouring chunks and the existing insights / concerns relevant to it
+CHUNK_VALIDATION_CONTEXT_MODE = "WINDOWED"
+CHUNK_VALIDATION_NEIGHBOUR_CHUNKS = 1
+CHUNK_VALIDATION_MAX_RELEVANT_ITEMS = 15
+RELEVANCE_INDEX_BM25_K1 = 1.5
+RELEVANCE_INDEX_BM25_B = 0.75
+## Re-analyse only the chunks changed since the previous revision of a document when
+## at least this share of its chunks is unchanged
+INCREMENTAL_ANALYSIS_ENABLED = True
+INCREMENTAL_ANALYSIS_MIN_SHARED_CHUNK_RATIO = 0.5
 
 ## Relational DB
 RELATIONAL_DB_NAME= DATA_DIR / "test_agent_db.sqlite3"
+RELATIONAL_DB_TIMEOUT_SECONDS = 30
+RELATIONAL_DB_STATEMENT_CACHE_SIZE = 256
+RELATIONAL_DB_MAX_BOUND_PARAMETERS = 900
+## Long-lived threads serving repository calls made from async code
+RELATIONAL_DB_EXECUTOR_WORKERS = 4
+RELATIONAL_DB_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": -64000,
+    "mmap_size": 268435456,
+    "busy_timeout": 30000,
+}
 USER_ROLES=["Admin", "Product Manager", "Software Developer", "Software Architect", "Software Tester"]
 RELEASE_STATUS_LIST=["DRAFT", "APPROVED"]
 DOCUMENT_TYPES=["PRD", "ADR", "DB_SCHEMA", "API_SPEC", "OTHER"]
 INSIGHT_STATUS=["PROPOSED", "APPROVED", "REJECTED"]
-CONCERN_STATUS=["OPEN", "RESOLVED"]
\ No newline at end of file
+CONCERN_STATUS=["OPEN", "RESOLVED"]
+JOB_STATUS=["PENDING", "RUNNING", "COMPLETED", "FAILED"]
+
+## Job Queue
+## One ingest worker per conversion process, so every process of the pool is kept busy
+JOB_WORKERS = {"INGEST_DOCUMENT": CONVERSION_WORKER_COUNT, "GENERATE_INSIGHTS": 1}
+## Live SSE analyses run outside the job queue, so they are capped separately
+INSIGHT_STREAM_MAX_CONCURRENCY = JOB_WORKERS["GENERATE_INSIGHTS"]
+JOB_MAX_ATTEMPTS = 3
+JOB_LEASE_SECONDS = 60
+JOB_POLL_INTERVAL_SECONDS = 1
+JOB_RETRY_BASE_DELAY_SECONDS = 10
+JOB_RETRY_MAX_DELAY_SECONDS = 600
+UPLOADS_DIR = DATA_DIR / "uploads"
+## Streamed uploads are written to UPLOADS_DIR chunk by chunk while being hashed
+UPLOAD_MAX_BYTES = 200 * 1024 * 1024
\ No newline at end of file
@@ -0,0 +1,90 @@
+import asyncio
+import contextvars
+import functools
+import sqlite3
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from test_agent import config
+
+_local = threading.local()
+_registry_lock = threading.Lock()
+## Weakly referenced, so a thread's connections are released (and closed) with the
+## thread-local holder when the thread exits
+_thread_connections: weakref.WeakSet = weakref.WeakSet()
+
+_db_executor = ThreadPoolExecutor(
+    max_workers=config.RELATIONAL_DB_EXECUTOR_WORKERS, thread_name_prefix="db"
+)
+
+
+class _ThreadConnections:
+    # Connections of one thread by database path; only `_local` holds it strongly
+
+    def __init__(self):
+        self.by_path: dict[Path, sqlite3.Connection] = {}
+
+
+def _open_connection(db_path: Path) -> sqlite3.Connection:
+
+    conn = sqlite3.connect(
+        str(db_path),
+        timeout=config.RELATIONAL_DB_TIMEOUT_SECONDS,
+        cached_statements=config.RELATIONAL_DB_STATEMENT_CACHE_SIZE,
+    )
+    for pragma, value in config.RELATIONAL_DB_PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    return conn
+
+
+def get_connection(db_path: Path = None) -> sqlite3.Connection:
+    # One connection per (thread, database) kept open for the thread's lifetime so
+    # the page cache and prepared statement cache stay warm across repository calls.
+    # `with get_connection() as conn:` commits / rolls back like `sqlite3.connect`.
+    db_path = Path(db_path or config.RELATIONAL_DB_NAME)
+
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = _ThreadConnections()
+        with _registry_lock:
+            _thread_connections.add(connections)
+
+    conn = connections.by_path.get(db_path)
+    if conn is None:
+        conn = connections.by_path[db_path] = _open_connection(db_path)
+    return conn
+
+
+async def run_in_db_executor(func, *args, **kwargs):
+    # Repository calls from async code run on a few long-lived threads, so they reuse
+    # warm connections; `asyncio.to_thread` would use a new executor per event loop.
+    # Context variables are propagated like `asyncio.to_thread` does.
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        _db_executor, functools.partial(context.run, func, *args, **kwargs)
+    )
+
+
+def close_connection(db_path: Path = None):
+    db_path = Path(db_path or config.RELATIONAL_DB_NAME)
+
+    connections = getattr(_local, "connections", None)
+    conn = connections.by_path.pop(db_path, None) if connections else None
+    if conn is not None:
+        conn.close()
+
+
+def close_all_connections():
+
+    with _registry_lock:
+        thread_connections = list(_thread_connections)
+
+    for connections in thread_connections:
+        for db_path, conn in list(connections.by_path.items()):
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # Connection owned by another (still running) thread
+                continue
+            connections.by_path.pop(db_path, None)
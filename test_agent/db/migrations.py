@@ -0,0 +1,107 @@
+import sqlite3
+from test_agent import config
+
+## Append-only list of (version, name, statements). `PRAGMA user_version` records
+## the last applied version, so every migration runs exactly once per database.
+MIGRATIONS = [
+    (
+        1,
+        "hot_path_indexes",
+        [
+            """CREATE INDEX IF NOT EXISTS idx_project_organization
+            ON project (organization_id) WHERE deleted_at IS NULL""",
+            """CREATE INDEX IF NOT EXISTS idx_release_project_created
+            ON release (project_id, created_at) WHERE deleted_at IS NULL""",
+            """CREATE INDEX IF NOT EXISTS idx_document_project_release
+            ON document (project_id, release_id) WHERE deleted_at IS NULL""",
+            """CREATE INDEX IF NOT EXISTS idx_document_hash
+            ON document (document_hash, project_id, release_id, created_at)""",
+            """CREATE INDEX IF NOT EXISTS idx_document_chunk_document_index
+            ON document_chunk (document_id, chunk_index)""",
+            """CREATE INDEX IF NOT EXISTS idx_product_insight_scope
+            ON product_insight (project_id, release_id, document_id) WHERE deleted_at IS NULL""",
+            """CREATE INDEX IF NOT EXISTS idx_product_concern_scope
+            ON product_concern (project_id, release_id, document_id) WHERE deleted_at IS NULL""",
+        ],
+    ),
+    (
+        2,
+        "job_queue",
+        [
+            f"""CREATE TABLE IF NOT EXISTS job(
+            id UUID PRIMARY KEY,
+            job_type TEXT NOT NULL,
+            status TEXT CHECK(status IN ({", ".join([f"'{status}'" for status in config.JOB_STATUS])})) NOT NULL,
+            payload JSONB CHECK(json_valid(payload)) NOT NULL,
+            result JSONB DEFAULT NULL,
+            error TEXT DEFAULT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL,
+            run_after DATETIME DEFAULT CURRENT_TIMESTAMP,
+            lease_owner TEXT DEFAULT NULL,
+            lease_expires_at DATETIME DEFAULT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            modified_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            completed_at DATETIME DEFAULT NULL
+            )
+            """,
+            """CREATE INDEX IF NOT EXISTS idx_job_claimable
+            ON job (job_type, run_after) WHERE status = 'PENDING'""",
+            """CREATE INDEX IF NOT EXISTS idx_job_lease
+            ON job (lease_expires_at) WHERE status = 'RUNNING'""",
+        ],
+    ),
+    (
+        3,
+        "chunk_content_hash",
+        [
+            """ALTER TABLE document_chunk ADD COLUMN content_hash TEXT DEFAULT NULL""",
+            """ALTER TABLE product_insight ADD COLUMN source_chunk_hash TEXT DEFAULT NULL""",
+            """ALTER TABLE product_concern ADD COLUMN source_chunk_hash TEXT DEFAULT NULL""",
+            """CREATE INDEX IF NOT EXISTS idx_document_chunk_content_hash
+            ON document_chunk (content_hash) WHERE deleted_at IS NULL""",
+        ],
+    ),
+    (
+        4,
+        "job_active_index",
+        [
+            """CREATE INDEX IF NOT EXISTS idx_job_active
+            ON job (job_type, status) WHERE status IN ('PENDING', 'RUNNING')""",
+        ],
+    ),
+    (
+        5,
+        "finding_job_id",
+        [
+            """ALTER TABLE product_insight ADD COLUMN job_id TEXT DEFAULT NULL""",
+            """ALTER TABLE product_concern ADD COLUMN job_id TEXT DEFAULT NULL""",
+            """CREATE INDEX IF NOT EXISTS idx_product_insight_job
+            ON product_insight (job_id) WHERE job_id IS NOT NULL""",
+            """CREATE INDEX IF NOT EXISTS idx_product_concern_job
+            ON product_concern (job_id) WHERE job_id IS NOT NULL""",
+        ],
+    ),
+]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_migrations(conn: sqlite3.Connection) -> int:
+
+    current_version = get_schema_version(conn)
+    for version, name, statements in MIGRATIONS:
+        if version <= current_version:
+            continue
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        for statement in statements:
+            conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {version}")
+        conn.commit()
+        current_version = version
+        print(f"Applied DB migration {version:03d} - {name}")
+
+    return current_version
@@ -0,0 +1,163 @@
+import re
+import sys
+import tempfile
+from pathlib import Path
+from uuid6 import uuid7
+from test_agent import config
+from test_agent.db.connection import get_connection, close_connection
+from test_agent.db.setup import initialize_db
+from test_agent.db.repositories import core, document, product, job
+from test_agent.schemas.agent_schemas.prd_agent_schemas import (
+    ProductInsight,
+    ProductConcern,
+)
+
+## Manual check, not run by CI or pytest: `python -m test_agent.db.query_plan_check`
+## exits with status 1 when any repository query falls back to a full table scan.
+## Run it after changing a query or an index.
+
+## Tables small enough (a handful of rows per deployment) that a full scan is fine
+FULL_SCAN_ALLOWED_TABLES = {"organization"}
+
+_SCAN_PATTERN = re.compile(r"^SCAN (\w+)")
+
+
+def _exercise_repositories():
+
+    organization = core.create_organization(f"Query Plan Org {uuid7()}")
+    core.get_organizations()
+    project = core.create_project(organization["id"], "Query Plan Project")
+    core.get_projects(organization["id"])
+    release = core.create_release(project["id"], "v1.0.0", "DRAFT")
+    core.get_releases(project["id"])
+    core.does_project_exist(project["id"])
+    core.does_release_exist(release["id"])
+
+    document_id = document.create_document(
+        project_id=project["id"],
+        document_type="PRD",
+        content="# Query Plan PRD",
+        document_hash="query-plan-hash",
+        document_status="APPROVED",
+        release_id=release["id"],
+    )
+    document.create_document(
+        project_id=project["id"],
+        document_type="PRD",
+        content="# Query Plan PRD",
+        document_hash="query-plan-hash",
+        document_status="APPROVED",
+        release_id=release["id"],
+    )
+    document.get_documents_by_release(project["id"], release["id"])
+    document.get_documents_by_ids([document_id], include_chunks=True)
+    document.does_document_exist(document_id, project["id"], release["id"])
+    document.create_document_chunks(document_id, ["# One", "## Two", "## Three"])
+    document.create_document_chunks(document_id, ["# One", "## Two (edited)"])
+    document.get_document_chunks(document_id)
+
+    insight = ProductInsight(
+        id=uuid7(),
+        title="Query plan insight",
+        description="Query plan insight",
+        flow_type="user_flow",
+        priority="P1",
+        expected_outcomes=["Indexes are used"],
+    )
+    concern = ProductConcern(
+        id=uuid7(),
+        type="ambiguity",
+        severity="LOW",
+        description="Query plan concern",
+    )
+    product.create_insights(project["id"], release["id"], document_id, [insight])
+    product.get_insights(project["id"], release["id"])
+    product.get_insights(project["id"], release["id"], document_id)
+    product.update_insight(insight.id, {"status": "APPROVED"})
+    product.create_concerns(project["id"], release["id"], document_id, [concern])
+    product.get_concerns(project["id"], release["id"])
+    product.get_concerns(project["id"], release["id"], document_id)
+    product.update_concern(concern.id, {"status": "RESOLVED"})
+    product.delete_job_findings(uuid7())
+
+    revised_document_id = document.create_document(
+        project_id=project["id"],
+        document_type="PRD",
+        content="# Query Plan PRD (revised)",
+        document_hash="query-plan-hash-revised",
+        document_status="APPROVED",
+        release_id=release["id"],
+    )
+    document.create_document_chunks(revised_document_id, ["# One", "## Three"])
+    document.get_previous_document_revision(
+        revised_document_id, project["id"], release["id"]
+    )
+
+    job_id = job.create_job("QUERY_PLAN_CHECK", {"document_id": str(document_id)})
+    claimed_job = job.claim_job("QUERY_PLAN_CHECK", "query-plan-worker")
+    job.renew_job_lease(claimed_job["id"], "query-plan-worker")
+    job.fail_job(claimed_job["id"], "query-plan-worker", "retry", 0)
+    claimed_job = job.claim_job("QUERY_PLAN_CHECK", "query-plan-worker")
+    job.complete_job(claimed_job["id"], "query-plan-worker", {"status": "done"})
+    job.requeue_expired_jobs()
+    job.count_active_jobs("QUERY_PLAN_CHECK")
+    job.get_job(job_id)
+
+
+def collect_repository_queries() -> list[str]:
+
+    statements = []
+    conn = get_connection()
+    conn.set_trace_callback(statements.append)
+    try:
+        _exercise_repositories()
+    finally:
+        conn.set_trace_callback(None)
+
+    queries = []
+    for statement in statements:
+        statement = " ".join(statement.split())
+        if statement.upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            if statement not in queries:
+                queries.append(statement)
+    return queries
+
+
+def find_full_scans(query: str) -> list[str]:
+
+    plan = get_connection().execute(f"EXPLAIN QUERY PLAN {query}").fetchall()
+    full_scans = []
+    for row in plan:
+        match = _SCAN_PATTERN.match(row[3])
+        if match and match.group(1) not in FULL_SCAN_ALLOWED_TABLES:
+            full_scans.append(row[3])
+    return full_scans
+
+
+def run_check() -> bool:
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        original_db = config.RELATIONAL_DB_NAME
+        config.RELATIONAL_DB_NAME = Path(tmp_dir) / "query_plan_check.sqlite3"
+        try:
+            initialize_db()
+            regressions = []
+            queries = collect_repository_queries()
+            for query in queries:
+                full_scans = find_full_scans(query)
+                if full_scans:
+                    regressions.append((query, full_scans))
+        finally:
+            close_connection()
+            config.RELATIONAL_DB_NAME = original_db
+
+    print(f"Checked {len(queries)} repository queries")
+    for query, full_scans in regressions:
+        print("--" * 30)
+        print(f"FULL TABLE SCAN : {', '.join(full_scans)}")
+        print(query)
+    return not regressions
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_check() else 1)
@@ -1,13 +1,13 @@
-import sqlite3
 from typing import List, Dict
 from test_agent import config
 from uuid6 import uuid7
 from uuid import UUID
 from test_agent.utils.common import is_valid_uuid
+from test_agent.db.connection import get_connection
 
 def get_organizations() -> List[Dict]:
 
-    with sqlite3.connect(config.RELATIONAL_DB_NAME) as conn:
+    with get_connection() as conn:
         result = conn.execute(
             """SELECT * FROM organization WHERE deleted_at is null"""
         ).fetchall()
@@ -17,7 +17,7 @@ def get_organizations() -> List[Dict]:
 
 def create_organization(name: str) -> List[Dict]:
 
-    with sqlite3.connect(config.RELATIONAL_DB_NAME) as conn:
+    with get_connection() as conn:
         result = conn.execute(
             """SELECT id FROM organization WHERE name = ? AND deleted_at is null""",
             (name,),
@@ -37,7 +37,7 @@ def get_projects(organization_id: UUID) -> List[Dict]:
     if not is_valid_uuid(organization_id):
         raise ValueError(f"organization_id should be a valid UUID")
 
-    with sqlite3.connect(config.RELATIONAL_DB_NAME) as conn:
+    with get_connection() as conn:
         result = conn.execute(
             """SELECT * FROM project WHERE organization_id = ? AND deleted_at is null""",
             (str(organization_id),),
@@ -51,7 +51,7 @@ def create_project(organization_id: UUID, project_name: str) -> List[Dict]:
     if not is_valid_uuid(organization_id):
         raise ValueError(f"organization_id should be a valid UUID")
 
-    with sqlite3.connect(config.RELATIONAL_DB_NAME) as conn:
+    with get_connection() as conn:
         result = conn.execute(
             """SELECT project.name, project.id 
             FROM project INNER JOIN organization 
@@ -85,7 +85,7 @@ def get_releases(project_id: UUID) -> List[Dict]:
     if not is_valid_uuid(project_id):
         raise ValueError(f"project_id should be a valid UUID")
 
-    with sqlite3.connect(config.RELATIONAL_DB_NAME) as conn:
+    with get_connection() as conn:
         result = conn.execute(
             """SELECT * FROM release WHERE project_id = ? AND deleted_at is null ORDER BY created_at DESC""",
             (str(project_id),),
@@ -104,7 +104,7 @@ def create_release(
     if not is_valid_uuid(project_id):
         raise ValueError(f"project_id should be a valid UUID")
 
-    with sqlite3.connect(config.RELATIONAL_DB_NAME) as conn:
+    with get_connection() as conn:
         result = conn.execute(
             """SELECT release.label, release.id 
             FROM project INNER JOIN release 
@@ -138,10 +138,10 @@ def create_release(
 def does_release_exist(release_id: UUID) -> bool :
     if not is_valid_uuid(release_id) :
         raise ValueError("Release Id should be a valid UUID")
-    with sqlite3.connect(config.RELATIONAL_DB_NAME) as conn :
+    with get_connection() as conn:
         result = conn.execute(
-            """SELECT * from release where id = ?""", (str(release_id),)
-        )
+            """SELECT id from release where id = ?""", (str(release_id),)
+        ).fetchone()
     if result:
         return True
     return False
@@ -149,10 +149,10 @@ def does_release_exist(release_id: UUID) -> bool :
 def does_project_exist(project_id: UUID) -> bool :
     if not is_valid_uuid(project_id) :
         raise ValueError("Release Id should be a valid UUID")
-    with sqlite3.connect(config.RELATIONAL_DB_NAME) as conn :
+    with get_connection() as conn:
         result = conn.execute(
-            """SELECT * from project where id = ?""", (str(project_id),)
-        )
+            """SELECT id from project where id = ?""", (str(project_id),)
+        ).fetchone()
     if result:
         return True
     return False
\ No newline at end of file
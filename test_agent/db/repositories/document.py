@@ -1,5 +1,6 @@
-import sqlite3
 from uuid import UUID
+from itertools import batched
+import hashlib
 from uuid6 import uuid7
 from typing import List, Dict
 from test_agent import config
@@ -9,6 +10,26 @@ from test_agent.db.repositories.core import (
     does_project_exist,
 )
 from test_agent.utils.common import is_valid_uuid
+from test_agent.db.connection import get_connection
+
+
+def _find_document_id_by_hash(
+    conn, document_hash: str, project_id: UUID, release_id: UUID
+) -> str | None:
+    result = conn.execute(
+        """SELECT id from document 
+        WHERE document_hash = ? AND project_id = ? AND release_id = ? ORDER BY created_at DESC""",
+        (str(document_hash), str(project_id), str(release_id)),
+    ).fetchone()
+    return result[0] if result else None
+
+
+def get_document_id_by_hash(
+    document_hash: str, project_id: UUID, release_id: UUID
+) -> str | None:
+    # Served by idx_document_hash; used to skip conversion of already ingested uploads
+    with get_connection() as conn:
+        return _find_document_id_by_hash(conn, document_hash, project_id, release_id)
 
 
 def create_document(
@@ -42,16 +63,13 @@ def create_document(
     elif not does_release_exist(release_id):
         raise ValueError(f"Release Not Found: release_id - {release_id}")
 
-    with sqlite3.connect(config.RELATIONAL_DB_NAME) as conn:
+    with get_connection() as conn:
 
-        result = conn.execute(
-            """SELECT id from document 
-            WHERE document_hash = ? AND project_id = ? AND release_id = ? ORDER BY created_at DESC""",
-            (str(document_hash), str(project_id), str(release_id)),
-        ).fetchone()
-
-        if result:
-            return result[0]
+        existing_document_id = _find_document_id_by_hash(
+            conn, document_hash, project_id, release_id
+        )
+        if existing_document_id:
+            return existing_document_id
 
         document_id = uuid7()
         conn.execute(
@@ -76,12 +94,12 @@ def get_documents_by_release(project_id: UUID, release_id: UUID) -> List[Dict]:
         raise ValueError("ProjectID and ReleaseID should be a valid UUID")
     if not does_project_exist(project_id):
         raise ValueError(f"No active project found for project_id - '{project_id}'")
-    if not does_release_exist(project_id):
+    if not does_release_exist(release_id):
         raise ValueError(
             f"No active release found for release_id - '{release_id}' under project '{project_id}'"
         )
 
-    with sqlite3.connect(config.RELATIONAL_DB_NAME) as conn:
+    with get_connection() as conn:
         result = conn.execute(
             """SELECT id, document_hash, content FROM document WHERE project_id = ? AND release_id = ? AND deleted_at is null""",
             (
@@ -93,15 +111,29 @@ def get_documents_by_release(project_id: UUID, release_id: UUID) -> List[Dict]:
     return [{"id": row[0], "hash": row[1], "content": row[2]} for row in result]
 
 
-def get_documents_by_ids(document_ids: List[UUID]) -> List[Dict]:
+def get_documents_by_ids(
+    document_ids: List[UUID], include_chunks: bool = False
+) -> List[Dict]:
 
-    with sqlite3.connect(config.RELATIONAL_DB_NAME) as conn:
-        result = conn.execute(
-            f"""SELECT id, document_hash, content FROM document WHERE id IN (?) AND deleted_at IS null""",
-            (",".join([str(id) for id in document_ids]),),
-        ).fetchall()
+    document_ids = list(dict.fromkeys(str(id) for id in document_ids))
 
-    return [{"id": row[0], "hash": row[1], "content": row[2]} for row in result]
+    documents = {}
+    with get_connection() as conn:
+        for batch in batched(document_ids, config.RELATIONAL_DB_MAX_BOUND_PARAMETERS):
+            result = conn.execute(
+                f"""SELECT id, document_hash, content FROM document 
+                WHERE id IN ({", ".join("?" * len(batch))}) AND deleted_at IS null""",
+                batch,
+            ).fetchall()
+            for row in result:
+                documents[row[0]] = {"id": row[0], "hash": row[1], "content": row[2]}
+
+    if include_chunks:
+        document_chunks = get_document_chunks_by_document_ids(list(documents))
+        for document_id, document in documents.items():
+            document["chunks"] = document_chunks[document_id]
+
+    return [documents[id] for id in document_ids if id in documents]
 
 
 def does_document_exist(
@@ -127,50 +159,84 @@ def does_document_exist(
         query_conditions.append("AND release_id = ?")
         query_values.append(str(release_id))
 
-    with sqlite3.connect(config.RELATIONAL_DB_NAME) as conn:
+    with get_connection() as conn:
         result = conn.execute(
-            f"""SELECT * from document where {" ".join(query_conditions)}""",
+            f"""SELECT id from document where {" ".join(query_conditions)}""",
             tuple(query_values),
-        ).fetchall()
+        ).fetchone()
 
     if result:
         return True
     return False
 
 
-def create_document_chunks(document_id: UUID, chunks: list[str]) -> UUID:
+def _chunk_hash(chunk_content: str) -> str:
+    return hashlib.sha256(chunk_content.encode("utf-8")).hexdigest()
+
+
+def create_document_chunks(document_id: UUID, chunks: list[str]) -> List[UUID]:
 
     if not does_document_exist(document_id):
         raise ValueError(f"Document Not Found: document_id - {document_id}")
 
-    chunk_ids = []
-    for index, chunk_content in enumerate(chunks):
+    with get_connection() as conn:
+
+        existing_chunks = {
+            row[1]: row
+            for row in conn.execute(
+                """SELECT id, chunk_index, content, deleted_at, content_hash from document_chunk 
+                WHERE document_id = ?""",
+                (str(document_id),),
+            ).fetchall()
+        }
+
+        chunk_ids = []
+        added_chunks = []
+        modified_chunks = []
+        for index, chunk_content in enumerate(chunks):
+            existing_chunk = existing_chunks.pop(index, None)
+            if not existing_chunk:
+                chunk_id = uuid7()
+                added_chunks.append(
+                    (
+                        str(chunk_id),
+                        str(document_id),
+                        index,
+                        chunk_content,
+                        _chunk_hash(chunk_content),
+                    )
+                )
+            else:
+                chunk_id = existing_chunk[0]
+                # Chunks stored before content hashes existed are backfilled here
+                if (
+                    existing_chunk[2] != chunk_content
+                    or existing_chunk[3]
+                    or not existing_chunk[4]
+                ):
+                    modified_chunks.append(
+                        (chunk_content, _chunk_hash(chunk_content), chunk_id)
+                    )
+            chunk_ids.append(chunk_id)
 
-        with sqlite3.connect(config.RELATIONAL_DB_NAME) as conn:
+        removed_chunks = [
+            (chunk[0],) for chunk in existing_chunks.values() if not chunk[3]
+        ]
 
-            chunk_id = uuid7()
-            result = conn.execute(
-                """SELECT * from document_chunk 
-                WHERE document_id = ? AND chunk_index = ?""",
-                (
-                    str(document_id),
-                    index,
-                ),
-            ).fetchone()
-            if result:
-                chunk_id = result[0]
-
-            conn.execute(
-                """INSERT OR REPLACE INTO document_chunk (id, document_id, chunk_index, content)
-                VALUES (?,?,?,?)""",
-                (
-                    str(chunk_id),
-                    str(document_id),
-                    index,
-                    chunk_content,
-                ),
-            )
-            chunk_ids.append(chunk_id)
+        conn.executemany(
+            """INSERT INTO document_chunk (id, document_id, chunk_index, content, content_hash)
+            VALUES (?,?,?,?,?)""",
+            added_chunks,
+        )
+        conn.executemany(
+            """UPDATE document_chunk SET content = ?, content_hash = ?, deleted_at = NULL
+            WHERE id = ?""",
+            modified_chunks,
+        )
+        conn.executemany(
+            """UPDATE document_chunk SET deleted_at = CURRENT_TIMESTAMP WHERE id = ?""",
+            removed_chunks,
+        )
     return chunk_ids
 
 
@@ -179,12 +245,76 @@ def get_document_chunks(document_id: UUID) -> List[Dict]:
     if not does_document_exist(document_id):
         raise ValueError(f"Document '{document_id}' Does not Exist!")
 
-    with sqlite3.connect(config.RELATIONAL_DB_NAME) as conn:
+    with get_connection() as conn:
         result = conn.execute(
-            """SELECT id, chunk_index, content FROM document_chunk 
+            """SELECT id, chunk_index, content, content_hash FROM document_chunk 
             WHERE document_id = ? AND deleted_at is null 
             ORDER BY chunk_index ASC""",
             (str(document_id),),
         ).fetchall()
 
-    return [{"id": row[0], "chunk_index": row[1], "content": row[2]} for row in result]
+    return [
+        {"id": row[0], "chunk_index": row[1], "content": row[2], "content_hash": row[3]}
+        for row in result
+    ]
+
+
+def get_document_chunks_by_document_ids(document_ids: List[UUID]) -> Dict[str, List[Dict]]:
+
+    document_ids = list(dict.fromkeys(str(id) for id in document_ids))
+
+    document_chunks = {document_id: [] for document_id in document_ids}
+    with get_connection() as conn:
+        for batch in batched(document_ids, config.RELATIONAL_DB_MAX_BOUND_PARAMETERS):
+            result = conn.execute(
+                f"""SELECT document_id, id, chunk_index, content, content_hash FROM document_chunk 
+                WHERE document_id IN ({", ".join("?" * len(batch))}) AND deleted_at is null 
+                ORDER BY document_id, chunk_index ASC""",
+                batch,
+            ).fetchall()
+            for row in result:
+                document_chunks[row[0]].append(
+                    {
+                        "id": row[1],
+                        "chunk_index": row[2],
+                        "content": row[3],
+                        "content_hash": row[4],
+                    }
+                )
+
+    return document_chunks
+
+
+def get_previous_document_revision(
+    document_id: UUID, project_id: UUID, release_id: UUID
+) -> Dict | None:
+    # The analysed document in the same project / release sharing the most chunks
+    # (by content hash) with `document_id`
+
+    with get_connection() as conn:
+        result = conn.execute(
+            """SELECT previous_chunk.document_id, COUNT(DISTINCT previous_chunk.content_hash) AS shared_chunks
+            FROM document_chunk AS chunk
+            JOIN document_chunk AS previous_chunk
+                ON previous_chunk.content_hash = chunk.content_hash
+                AND previous_chunk.document_id != chunk.document_id
+                AND previous_chunk.deleted_at IS NULL
+            JOIN document ON document.id = previous_chunk.document_id
+            WHERE chunk.document_id = ? AND chunk.deleted_at IS NULL
+            AND document.project_id = ? AND document.release_id = ? AND document.deleted_at IS NULL
+            AND EXISTS (
+                SELECT 1 FROM product_insight
+                WHERE product_insight.project_id = document.project_id
+                AND product_insight.release_id = document.release_id
+                AND product_insight.document_id = document.id
+                AND product_insight.deleted_at IS NULL
+            )
+            GROUP BY previous_chunk.document_id
+            ORDER BY shared_chunks DESC, document.created_at DESC
+            LIMIT 1""",
+            (str(document_id), str(project_id), str(release_id)),
+        ).fetchone()
+
+    if not result:
+        return None
+    return {"id": result[0], "shared_chunks": result[1]}
@@ -0,0 +1,159 @@
+import json
+from typing import Dict, List
+from uuid import UUID
+from uuid6 import uuid7
+from test_agent import config
+from test_agent.utils.common import is_valid_uuid
+from test_agent.db.connection import get_connection
+
+
+def create_job(job_type: str, payload: Dict, max_attempts: int = None) -> UUID:
+
+    job_id = uuid7()
+    with get_connection() as conn:
+        conn.execute(
+            """INSERT INTO job (id, job_type, status, payload, max_attempts) VALUES (?,?,?,?,?)""",
+            (
+                str(job_id),
+                job_type,
+                "PENDING",
+                json.dumps(payload),
+                max_attempts or config.JOB_MAX_ATTEMPTS,
+            ),
+        )
+    return job_id
+
+
+def get_job(job_id: UUID) -> Dict | None:
+
+    if not is_valid_uuid(job_id):
+        raise ValueError("job_id should be a valid UUID")
+
+    with get_connection() as conn:
+        result = conn.execute(
+            """SELECT id, job_type, status, result, error, attempts, max_attempts,
+            run_after, created_at, modified_at, completed_at FROM job WHERE id = ?""",
+            (str(job_id),),
+        ).fetchone()
+
+    if not result:
+        return None
+
+    return {
+        "id": result[0],
+        "job_type": result[1],
+        "status": result[2],
+        "result": json.loads(result[3]) if result[3] else None,
+        "error": result[4],
+        "attempts": result[5],
+        "max_attempts": result[6],
+        "run_after": result[7],
+        "created_at": result[8],
+        "modified_at": result[9],
+        "completed_at": result[10],
+    }
+
+
+def count_active_jobs(job_type: str) -> int:
+
+    with get_connection() as conn:
+        result = conn.execute(
+            """SELECT COUNT(*) FROM job
+            WHERE job_type = ? AND status IN ('PENDING', 'RUNNING')""",
+            (job_type,),
+        ).fetchone()
+    return result[0]
+
+
+def claim_job(job_type: str, worker_id: str) -> Dict | None:
+
+    with get_connection() as conn:
+        result = conn.execute(
+            """UPDATE job SET status = 'RUNNING',
+            attempts = attempts + 1,
+            lease_owner = ?,
+            lease_expires_at = datetime('now', ?),
+            modified_at = CURRENT_TIMESTAMP
+            WHERE id = (
+                SELECT id FROM job
+                WHERE status = 'PENDING' AND job_type = ? AND run_after <= CURRENT_TIMESTAMP
+                ORDER BY run_after LIMIT 1
+            )
+            RETURNING id, job_type, payload, attempts, max_attempts""",
+            (worker_id, f"+{config.JOB_LEASE_SECONDS} seconds", job_type),
+        ).fetchone()
+
+    if not result:
+        return None
+
+    return {
+        "id": result[0],
+        "job_type": result[1],
+        "payload": json.loads(result[2]),
+        "attempts": result[3],
+        "max_attempts": result[4],
+    }
+
+
+def renew_job_lease(job_id: UUID, worker_id: str) -> bool:
+
+    with get_connection() as conn:
+        result = conn.execute(
+            """UPDATE job SET lease_expires_at = datetime('now', ?)
+            WHERE id = ? AND status = 'RUNNING' AND lease_owner = ?""",
+            (f"+{config.JOB_LEASE_SECONDS} seconds", str(job_id), worker_id),
+        )
+    return result.rowcount > 0
+
+
+def complete_job(job_id: UUID, worker_id: str, job_result: Dict = None):
+
+    with get_connection() as conn:
+        conn.execute(
+            """UPDATE job SET status = 'COMPLETED',
+            result = ?,
+            error = NULL,
+            lease_owner = NULL,
+            lease_expires_at = NULL,
+            modified_at = CURRENT_TIMESTAMP,
+            completed_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND lease_owner = ?""",
+            (json.dumps(job_result), str(job_id), worker_id),
+        )
+
+
+def fail_job(job_id: UUID, worker_id: str, error: str, retry_delay_seconds: int):
+
+    with get_connection() as conn:
+        conn.execute(
+            """UPDATE job SET status = CASE WHEN attempts >= max_attempts THEN 'FAILED' ELSE 'PENDING' END,
+            error = ?,
+            run_after = datetime('now', ?),
+            lease_owner = NULL,
+            lease_expires_at = NULL,
+            modified_at = CURRENT_TIMESTAMP,
+            completed_at = CASE WHEN attempts >= max_attempts THEN CURRENT_TIMESTAMP ELSE NULL END
+            WHERE id = ? AND lease_owner = ?""",
+            (error, f"+{retry_delay_seconds} seconds", str(job_id), worker_id),
+        )
+
+
+def requeue_expired_jobs() -> List[Dict]:
+    # Returns the expired jobs that ran out of attempts and are now FAILED
+
+    with get_connection() as conn:
+        result = conn.execute(
+            """UPDATE job SET status = CASE WHEN attempts >= max_attempts THEN 'FAILED' ELSE 'PENDING' END,
+            error = 'Job lease expired before completion',
+            lease_owner = NULL,
+            lease_expires_at = NULL,
+            modified_at = CURRENT_TIMESTAMP
+            WHERE status = 'RUNNING' AND lease_expires_at < CURRENT_TIMESTAMP
+            RETURNING id, job_type, status, payload"""
+        ).fetchall()
+
+    return [
+        {"id": row[0], "job_type": row[1], "payload": json.loads(row[3])}
+        for row in result
+        if row[2] == "FAILED"
+    ]
@@ -1,13 +1,12 @@
-import sqlite3
 from typing import List, Dict
 from uuid import UUID
 import json
-from test_agent import config
 from test_agent.schemas.agent_schemas.prd_agent_schemas import (
     ProductInsight,
     ProductConcern,
 )
 from test_agent.utils.common import is_valid_uuid
+from test_agent.db.connection import get_connection
 from test_agent.db.repositories.core import does_project_exist, does_release_exist
 from test_agent.db.repositories.document import does_document_exist
 
@@ -17,8 +16,11 @@ def create_insights(
     release_id: UUID,
     document_id: UUID,
     product_insights: List[ProductInsight],
+    source_chunk_hashes: Dict[UUID, str] = None,
+    job_id: UUID = None,
 ) -> List[UUID]:
 
+    source_chunk_hashes = source_chunk_hashes or {}
     data = [
         (
             str(insight.id),
@@ -27,14 +29,17 @@ def create_insights(
             str(document_id),
             insight.status,
             insight.model_dump_json(),
+            source_chunk_hashes.get(insight.id),
+            str(job_id) if job_id else None,
         )
         for insight in product_insights
     ]
-    with sqlite3.connect(config.RELATIONAL_DB_NAME) as conn:
+    with get_connection() as conn:
 
         conn.executemany(
             """INSERT OR REPLACE INTO product_insight 
-            (id, project_id, release_id, document_id, status, details) VALUES (?,?,?,?,?,?)""",
+            (id, project_id, release_id, document_id, status, details, source_chunk_hash, job_id)
+            VALUES (?,?,?,?,?,?,?,?)""",
             data,
         )
     return [insight.id for insight in product_insights]
@@ -54,18 +59,23 @@ def get_insights(
 
     if document_id:
         query_data = (str(project_id), str(release_id), str(document_id))
-        query = """SELECT id, status, details from product_insight
+        query = """SELECT id, status, details, source_chunk_hash from product_insight
             WHERE deleted_at is null AND project_id = ? AND release_id = ? AND document_id = ?"""
     else:
         query_data = (str(project_id), str(release_id))
-        query = """SELECT id, status, details from product_insight
+        query = """SELECT id, status, details, source_chunk_hash from product_insight
             WHERE deleted_at is null AND project_id = ? AND release_id = ?"""
 
-    with sqlite3.connect(config.RELATIONAL_DB_NAME) as conn:
+    with get_connection() as conn:
         result = conn.execute(query, query_data).fetchall()
 
     return [
-        {"id": insight[0], "status": insight[1], "details": insight[2]}
+        {
+            "id": insight[0],
+            "status": insight[1],
+            "details": insight[2],
+            "source_chunk_hash": insight[3],
+        }
         for insight in result
     ]
 
@@ -75,7 +85,7 @@ def get_insight(insight_id: UUID) -> Dict | None:
     if not is_valid_uuid(insight_id):
         raise ValueError("insight_id should be valid_uuid")
 
-    with sqlite3.connect(config.RELATIONAL_DB_NAME) as conn:
+    with get_connection() as conn:
         result = conn.execute(
             """SELECT id, project_id, release_id, document_id, status, details FROM product_insight
             WHERE id = ? and deleted_at is null""",
@@ -108,7 +118,7 @@ def update_insight(insight_id: UUID, insight_patch: Dict):
         updates.append("status = ?")
         values.append(insight_patch["status"])
     values.append(str(insight_id))
-    with sqlite3.connect(config.RELATIONAL_DB_NAME) as conn:
+    with get_connection() as conn:
         conn.execute(
             f"""UPDATE product_insight 
             SET modified_at = CURRENT_TIMESTAMP, 
@@ -118,13 +128,25 @@ def update_insight(insight_id: UUID, insight_patch: Dict):
         )
 
 
+def delete_insights(insight_ids: List[UUID]):
+    with get_connection() as conn:
+        conn.executemany(
+            """UPDATE product_insight SET deleted_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND deleted_at is null""",
+            [(str(insight_id),) for insight_id in insight_ids],
+        )
+
+
 def create_concerns(
     project_id: UUID,
     release_id: UUID,
     document_id: UUID,
     product_concerns: List[ProductConcern],
+    source_chunk_hashes: Dict[UUID, str] = None,
+    job_id: UUID = None,
 ) -> List[UUID]:
 
+    source_chunk_hashes = source_chunk_hashes or {}
     data = [
         (
             str(concern.id),
@@ -133,14 +155,17 @@ def create_concerns(
             str(document_id),
             concern.status,
             concern.model_dump_json(),
+            source_chunk_hashes.get(concern.id),
+            str(job_id) if job_id else None,
         )
         for concern in product_concerns
     ]
-    with sqlite3.connect(config.RELATIONAL_DB_NAME) as conn:
+    with get_connection() as conn:
 
         conn.executemany(
             """INSERT OR REPLACE INTO product_concern
-            (id, project_id, release_id, document_id, status, details) VALUES (?,?,?,?,?,?)""",
+            (id, project_id, release_id, document_id, status, details, source_chunk_hash, job_id)
+            VALUES (?,?,?,?,?,?,?,?)""",
             data,
         )
     return [concern.id for concern in product_concerns]
@@ -161,18 +186,23 @@ def get_concerns(
 
     if document_id:
         query_data = (str(project_id), str(release_id), str(document_id))
-        query = """SELECT id, status, details from product_concern
+        query = """SELECT id, status, details, source_chunk_hash from product_concern
             WHERE deleted_at is null AND project_id = ? AND release_id = ? AND document_id = ?"""
     else:
         query_data = (str(project_id), str(release_id))
-        query = """SELECT id, status, details from product_concern
+        query = """SELECT id, status, details, source_chunk_hash from product_concern
             WHERE deleted_at is null AND project_id = ? AND release_id = ?"""
 
-    with sqlite3.connect(config.RELATIONAL_DB_NAME) as conn:
+    with get_connection() as conn:
         result = conn.execute(query, query_data).fetchall()
 
     return [
-        {"id": concern[0], "status": concern[1], "details": concern[2]}
+        {
+            "id": concern[0],
+            "status": concern[1],
+            "details": concern[2],
+            "source_chunk_hash": concern[3],
+        }
         for concern in result
     ]
 
@@ -182,7 +212,7 @@ def get_concern(concern_id: UUID) -> Dict | None:
     if not is_valid_uuid(concern_id):
         raise ValueError("concern_id should be valid_uuid")
 
-    with sqlite3.connect(config.RELATIONAL_DB_NAME) as conn:
+    with get_connection() as conn:
         result = conn.execute(
             """SELECT id, project_id, release_id, document_id, status, details, resolved_by FROM product_concern
             WHERE id = ? and deleted_at is null""",
@@ -216,7 +246,7 @@ def update_concern(concern_id: UUID, concern_patch: Dict):
         updates.append("status = ?")
         values.append(concern_patch["status"])
     values.append(str(concern_id))
-    with sqlite3.connect(config.RELATIONAL_DB_NAME) as conn:
+    with get_connection() as conn:
         conn.execute(
             f"""UPDATE product_concern
             SET modified_at = CURRENT_TIMESTAMP, 
@@ -224,3 +254,23 @@ def update_concern(concern_id: UUID, concern_patch: Dict):
             WHERE id = ?""",
             tuple(values),
         )
+
+
+def delete_concerns(concern_ids: List[UUID]):
+    with get_connection() as conn:
+        conn.executemany(
+            """UPDATE product_concern SET deleted_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND deleted_at is null""",
+            [(str(concern_id),) for concern_id in concern_ids],
+        )
+
+
+def delete_job_findings(job_id: UUID):
+    # Soft deletes the insights / concerns persisted by earlier attempts of a job
+    with get_connection() as conn:
+        for table in ("product_insight", "product_concern"):
+            conn.execute(
+                f"""UPDATE {table} SET deleted_at = CURRENT_TIMESTAMP
+                WHERE job_id = ? AND deleted_at is null""",
+                (str(job_id),),
+            )
@@ -1,5 +1,7 @@
 import sqlite3
 from test_agent import config
+from test_agent.db.connection import get_connection
+from test_agent.db.migrations import apply_migrations
 
 default_organizations = [("d6573910-6b0f-4489-8ce1-c948c28bc42b", "Demo Organization")]
 
@@ -33,7 +35,7 @@ default_releases = [
 
 def initialize_db():
 
-    with sqlite3.connect(str(config.RELATIONAL_DB_NAME)) as conn:
+    with get_connection() as conn:
         conn: sqlite3.Connection
 
         cursor = conn.cursor()
@@ -159,8 +161,7 @@ def initialize_db():
             deleted_at DATETIME DEFAULT NULL,
             FOREIGN KEY (project_id) REFERENCES project(id) ON DELETE CASCADE,
             FOREIGN KEY (release_id) REFERENCES release(id) ON DELETE CASCADE,
-            FOREIGN KEY (document_id) REFERENCES document(id) ON DELETE CASCADE,
-            FOREIGN KEY (resolved_by) REFERENCES user(id)
+            FOREIGN KEY (document_id) REFERENCES document(id) ON DELETE CASCADE
             )
             """
         )
@@ -196,6 +197,8 @@ def initialize_db():
             """
         )
 
+        apply_migrations(conn)
+
 
 if __name__ == "__main__":
     initialize_db()
@@ -0,0 +1,288 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.callbacks.manager import adispatch_custom_event
+from langchain_core.outputs import LLMResult
+from test_agent import config
+from test_agent.llm.response_cache import is_cached_generation
+
+THROTTLE_WAIT_EVENT = "llm_throttle_wait"
+LLM_RETRY_EVENT = "llm_retry"
+
+_NODE_COUNTERS = (
+    "queue_wait_seconds",
+    "llm_calls",
+    "llm_cache_hits",
+    "input_tokens",
+    "cached_input_tokens",
+    "output_tokens",
+    "tool_calls",
+    "retries",
+)
+
+_node_metrics_lock = threading.Lock()
+_node_metrics: Dict[str, Dict] = {}
+
+
+async def report_llm_event(name: str, data: Dict):
+    # Attributed by NodeTracer to the graph node that is running the LLM call
+    try:
+        await adispatch_custom_event(name, data)
+    except RuntimeError:
+        # Called outside of a runnable (no parent run to attach the event to)
+        pass
+
+
+def _is_node_run(name: str, tags: List[str], metadata: Dict) -> bool:
+    return name == metadata.get("langgraph_node") and any(
+        tag.startswith("graph:step:") for tag in tags
+    )
+
+
+def _node_path(name: str, metadata: Dict) -> str:
+    # Nodes of a graph invoked from another graph's node are prefixed with that node,
+    # e.g. `chunk_level_insight_validator/validate_insights`
+    checkpoint_ns = metadata.get("checkpoint_ns") or ""
+    parents = [part.split(":")[0] for part in checkpoint_ns.split("|") if part]
+    return "/".join(parents + [name])
+
+
+class NodeTracer(BaseCallbackHandler):
+    # One span per node execution of every graph run under it (including the chunk
+    # validator graph), recording wall time, throttle queue wait, LLM usage, tool calls
+    # and rate-limit retries. Finished spans also feed the process-wide Prometheus metrics.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+        self._spans: Dict[UUID, Dict] = {}
+        self._run_spans: Dict[UUID, UUID] = {}
+
+    def _span_for(self, run_id: UUID) -> Dict | None:
+        span_id = run_id if run_id in self._spans else self._run_spans.get(run_id)
+        return self._spans.get(span_id)
+
+    def on_chain_start(
+        self,
+        serialized: Dict[str, Any],
+        inputs: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID = None,
+        tags: List[str] = None,
+        metadata: Dict[str, Any] = None,
+        **kwargs: Any,
+    ):
+        name = kwargs.get("name") or ""
+        metadata = metadata or {}
+        with self._lock:
+            if _is_node_run(name, tags or [], metadata):
+                self._spans[run_id] = {
+                    "node": _node_path(name, metadata),
+                    "step": metadata.get("langgraph_step"),
+                    "started_at": time.time() - self._started_at,
+                    "wall_seconds": None,
+                    "status": "running",
+                    **{counter: 0 for counter in _NODE_COUNTERS},
+                }
+            elif parent_run_id is not None:
+                span_id = (
+                    parent_run_id
+                    if parent_run_id in self._spans
+                    else self._run_spans.get(parent_run_id)
+                )
+                if span_id is not None:
+                    self._run_spans[run_id] = span_id
+
+    def on_chat_model_start(
+        self, serialized: Dict[str, Any], messages: Any, *, run_id: UUID, **kwargs: Any
+    ):
+        self.on_llm_start(serialized, [], run_id=run_id, **kwargs)
+
+    def on_llm_start(
+        self,
+        serialized: Dict[str, Any],
+        prompts: List[str],
+        *,
+        run_id: UUID,
+        parent_run_id: UUID = None,
+        **kwargs: Any,
+    ):
+        with self._lock:
+            span_id = (
+                parent_run_id
+                if parent_run_id in self._spans
+                else self._run_spans.get(parent_run_id)
+            )
+            if span_id is not None:
+                self._run_spans[run_id] = span_id
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+
+        with self._lock:
+            span = self._span_for(run_id)
+            self._run_spans.pop(run_id, None)
+            if span is None:
+                return
+            for generations in response.generations:
+                for generation in generations:
+                    if is_cached_generation(generation):
+                        span["llm_cache_hits"] += 1
+                        continue
+                    message = getattr(generation, "message", None)
+                    usage_metadata = getattr(message, "usage_metadata", None) or {}
+                    input_token_details = usage_metadata.get("input_token_details") or {}
+                    span["llm_calls"] += 1
+                    span["input_tokens"] += usage_metadata.get("input_tokens", 0)
+                    span["cached_input_tokens"] += (
+                        input_token_details.get("cache_read", 0) or 0
+                    )
+                    span["output_tokens"] += usage_metadata.get("output_tokens", 0)
+                    span["tool_calls"] += len(getattr(message, "tool_calls", None) or [])
+
+    def on_custom_event(
+        self, name: str, data: Any, *, run_id: UUID, **kwargs: Any
+    ):
+        with self._lock:
+            span = self._span_for(run_id)
+            if span is None:
+                return
+            if name == THROTTLE_WAIT_EVENT:
+                span["queue_wait_seconds"] += data.get("wait_seconds", 0.0)
+            elif name == LLM_RETRY_EVENT:
+                span["retries"] += 1
+
+    def _end_run(self, run_id: UUID, status: str, error: BaseException = None):
+
+        with self._lock:
+            self._run_spans.pop(run_id, None)
+            span = self._spans.get(run_id)
+            if span is None or span["status"] != "running":
+                return
+            span["wall_seconds"] = time.time() - self._started_at - span["started_at"]
+            span["status"] = status
+            if error is not None:
+                span["error"] = f"{type(error).__name__}: {error}"
+            span = dict(span)
+        _record_node_metrics(span)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any):
+        self._end_run(run_id, "ok")
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._end_run(run_id, "error", error)
+
+    def get_trace(self) -> Dict:
+
+        with self._lock:
+            spans = sorted(
+                (dict(span) for span in self._spans.values()),
+                key=lambda span: span["started_at"],
+            )
+        nodes = defaultdict(lambda: {"runs": 0, "wall_seconds": 0.0})
+        for span in spans:
+            node = nodes[span["node"]]
+            node["runs"] += 1
+            node["wall_seconds"] += span["wall_seconds"] or 0.0
+            for counter in _NODE_COUNTERS:
+                node[counter] = node.get(counter, 0) + span[counter]
+        return {
+            "started_at": self._started_at,
+            "duration_seconds": time.time() - self._started_at,
+            "nodes": dict(nodes),
+            "spans": spans,
+        }
+
+    def write_trace(self, trace_name: str, trace_dir: Path = None) -> Path:
+        trace_dir = Path(trace_dir or config.NODE_TRACE_DIR)
+        trace_dir.mkdir(parents=True, exist_ok=True)
+        trace_path = trace_dir / f"{trace_name}.json"
+        trace_path.write_text(json.dumps(self.get_trace(), indent=2))
+        return trace_path
+
+
+def _record_node_metrics(span: Dict):
+
+    with _node_metrics_lock:
+        metrics = _node_metrics.setdefault(
+            span["node"],
+            {
+                "runs": defaultdict(int),
+                "duration_buckets": [0] * len(config.NODE_LATENCY_BUCKETS_SECONDS),
+                "duration_sum": 0.0,
+                **{counter: 0 for counter in _NODE_COUNTERS},
+            },
+        )
+        metrics["runs"][span["status"]] += 1
+        metrics["duration_sum"] += span["wall_seconds"]
+        for bucket_index, bucket in enumerate(config.NODE_LATENCY_BUCKETS_SECONDS):
+            if span["wall_seconds"] <= bucket:
+                metrics["duration_buckets"][bucket_index] += 1
+        for counter in _NODE_COUNTERS:
+            metrics[counter] += span[counter]
+
+
+def render_prometheus_metrics() -> str:
+    # Prometheus text exposition format (0.0.4) of every node run in this process
+
+    with _node_metrics_lock:
+        node_metrics = {
+            node: {
+                **metrics,
+                "runs": dict(metrics["runs"]),
+                "duration_buckets": list(metrics["duration_buckets"]),
+            }
+            for node, metrics in _node_metrics.items()
+        }
+
+    lines = [
+        "# HELP test_agent_node_runs_total Graph node executions",
+        "# TYPE test_agent_node_runs_total counter",
+    ]
+    for node, metrics in node_metrics.items():
+        for status, runs in metrics["runs"].items():
+            lines.append(
+                f'test_agent_node_runs_total{{node="{node}",status="{status}"}} {runs}'
+            )
+
+    lines.extend(
+        [
+            "# HELP test_agent_node_duration_seconds Graph node wall time",
+            "# TYPE test_agent_node_duration_seconds histogram",
+        ]
+    )
+    for node, metrics in node_metrics.items():
+        for bucket, count in zip(
+            config.NODE_LATENCY_BUCKETS_SECONDS, metrics["duration_buckets"]
+        ):
+            lines.append(
+                f'test_agent_node_duration_seconds_bucket{{node="{node}",le="{bucket}"}} {count}'
+            )
+        run_count = sum(metrics["runs"].values())
+        lines.append(
+            f'test_agent_node_duration_seconds_bucket{{node="{node}",le="+Inf"}} {run_count}'
+        )
+        lines.append(
+            f'test_agent_node_duration_seconds_sum{{node="{node}"}} {metrics["duration_sum"]}'
+        )
+        lines.append(
+            f'test_agent_node_duration_seconds_count{{node="{node}"}} {run_count}'
+        )
+
+    for counter in _NODE_COUNTERS:
+        metric_name = f"test_agent_node_{counter}_total"
+        lines.extend(
+            [
+                f"# HELP {metric_name} Graph node {counter.replace('_', ' ')}",
+                f"# TYPE {metric_name} counter",
+            ]
+        )
+        for node, metrics in node_metrics.items():
+            lines.append(f'{metric_name}{{node="{node}"}} {metrics[counter]}')
+
+    return "\n".join(lines) + "\n"
@@ -1,8 +1,13 @@
 from langchain_ollama import ChatOllama
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_openai import ChatOpenAI
+from langchain_core.language_models import BaseChatModel
+from langchain_core.rate_limiters import InMemoryRateLimiter
+from langchain_core.runnables import Runnable, RunnableBinding
 from enum import Enum
 from test_agent import config
+from test_agent.llm.throttle import PlatformThrottle
+from test_agent.llm.response_cache import SqliteResponseCache
 import dotenv
 import os
 
@@ -14,12 +19,78 @@ class ModelManager:
     _ollama_llm_instances = {}
     _gemini_llm_instances = {}
     _gpt_instances = {}
+    _rate_limiters = {}
+    _throttles = {}
+    _response_cache: SqliteResponseCache = None
+    _instance_override: BaseChatModel = None
 
     class PLATFORMS(Enum):
         OLLAMA = "ollama"
         GEMINI = "gemini"
         GPT = "gpt"
 
+    @classmethod
+    def get_rate_limiter(cls, llm_platform: str) -> InMemoryRateLimiter | None:
+
+        llm_platform = llm_platform.lower()
+        rate_limit = config.LLM_RATE_LIMITS.get(llm_platform)
+        if not rate_limit:
+            return None
+        if llm_platform not in cls._rate_limiters:
+            cls._rate_limiters[llm_platform] = InMemoryRateLimiter(
+                requests_per_second=rate_limit["requests_per_second"],
+                max_bucket_size=rate_limit["max_bucket_size"],
+            )
+        return cls._rate_limiters[llm_platform]
+
+    @classmethod
+    def get_throttle(
+        cls, llm_platform: str = config.DEFAULT_LLM_PLATFORM
+    ) -> PlatformThrottle:
+
+        llm_platform = llm_platform.lower()
+        if llm_platform not in cls._throttles:
+            cls._throttles[llm_platform] = PlatformThrottle(
+                llm_platform=llm_platform,
+                max_concurrency=config.LLM_MAX_CONCURRENCY.get(llm_platform, 1),
+            )
+        return cls._throttles[llm_platform]
+
+    @classmethod
+    def get_throttle_metrics(cls) -> dict:
+        return {
+            llm_platform: throttle.get_metrics()
+            for llm_platform, throttle in cls._throttles.items()
+        }
+
+    @classmethod
+    def get_response_cache(cls) -> SqliteResponseCache | None:
+
+        if not config.LLM_RESPONSE_CACHE_ENABLED:
+            return None
+        if cls._response_cache is None:
+            cls._response_cache = SqliteResponseCache()
+        return cls._response_cache
+
+    @classmethod
+    def bind_prompt_cache(cls, llm: Runnable, prompt_cache_key: str) -> Runnable:
+        # Gemini (implicit caching) and Ollama (KV reuse) match the shared prefix on
+        # their own; OpenAI routes requests with the same key to the same cache.
+        # Decided from the model actually bound (under bind_tools & co.), not a platform
+        # argument, so it follows whatever get_instance resolved.
+        model = llm
+        while isinstance(model, RunnableBinding):
+            model = model.bound
+        if isinstance(model, ChatOpenAI):
+            return llm.bind(prompt_cache_key=prompt_cache_key)
+        return llm
+
+    @classmethod
+    def set_instance_override(cls, llm: BaseChatModel | None):
+        # While set, every get_instance call returns `llm` (offline benchmarks);
+        # None restores the platform models
+        cls._instance_override = llm
+
     @classmethod
     def get_instance(
         cls,
@@ -27,11 +98,18 @@ class ModelManager:
         llm_model: str = None,
     ):
 
+        if cls._instance_override is not None:
+            return cls._instance_override
+
         if llm_platform.lower() == cls.PLATFORMS.OLLAMA.value:
             llm_model = llm_model or config.DEFAULT_LLM_MODELS[cls.PLATFORMS.OLLAMA.value]
             if llm_model not in cls._ollama_llm_instances:
                 cls._ollama_llm_instances[llm_model] = ChatOllama(
-                    base_url=os.getenv("OLLAMA_BASE_URL"), model=llm_model
+                    base_url=os.getenv("OLLAMA_BASE_URL"),
+                    model=llm_model,
+                    keep_alive=config.OLLAMA_KEEP_ALIVE,
+                    rate_limiter=cls.get_rate_limiter(cls.PLATFORMS.OLLAMA.value),
+                    cache=cls.get_response_cache(),
                 )
             return cls._ollama_llm_instances[llm_model]
 
@@ -39,7 +117,10 @@ class ModelManager:
             llm_model = llm_model or config.DEFAULT_LLM_MODELS[cls.PLATFORMS.GEMINI.value]
             if llm_model not in cls._gemini_llm_instances:
                 cls._gemini_llm_instances[llm_model] = ChatGoogleGenerativeAI(
-                    model=llm_model, google_api_key=os.getenv("GOOGLE_API_KEY")
+                    model=llm_model,
+                    google_api_key=os.getenv("GOOGLE_API_KEY"),
+                    rate_limiter=cls.get_rate_limiter(cls.PLATFORMS.GEMINI.value),
+                    cache=cls.get_response_cache(),
                 )
             return cls._gemini_llm_instances[llm_model]
         
@@ -47,7 +128,10 @@ class ModelManager:
             llm_model = llm_model or config.DEFAULT_LLM_MODELS[cls.PLATFORMS.GPT.value]
             if llm_model not in cls._gpt_instances:
                 cls._gpt_instances[llm_model] = ChatOpenAI(
-                    model=llm_model, api_key=os.getenv("OPEN_AI_API_KEY")
+                    model=llm_model,
+                    api_key=os.getenv("OPEN_AI_API_KEY"),
+                    rate_limiter=cls.get_rate_limiter(cls.PLATFORMS.GPT.value),
+                    cache=cls.get_response_cache(),
                 )
             return cls._gpt_instances[llm_model]
 
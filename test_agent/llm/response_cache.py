@@ -0,0 +1,184 @@
+import contextvars
+import hashlib
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict
+from langchain_core.caches import BaseCache, RETURN_VAL_TYPE
+from langchain_core.messages import messages_from_dict, messages_to_dict
+from langchain_core.outputs import ChatGeneration
+from test_agent import config
+from test_agent.db.connection import get_connection
+
+_bypass_llm_cache = contextvars.ContextVar("bypass_llm_cache", default=False)
+
+
+@contextmanager
+def llm_cache_bypass(bypass: bool = True):
+    # Within this block cached responses are ignored; fresh responses still refresh the cache
+    token = _bypass_llm_cache.set(bypass)
+    try:
+        yield
+    finally:
+        _bypass_llm_cache.reset(token)
+
+
+class SqliteResponseCache(BaseCache):
+    # LangChain's cache `llm_string` holds the platform, model, its parameters and the
+    # bound tool schemas, and `prompt` the serialised messages, so the key covers all four
+
+    def __init__(
+        self, db_path: Path = None, ttl_seconds: int = None, max_bytes: int = None
+    ):
+        self.db_path = Path(db_path or config.LLM_RESPONSE_CACHE_DB_NAME)
+        self.ttl_seconds = ttl_seconds or config.LLM_RESPONSE_CACHE_TTL_SECONDS
+        self.max_bytes = max_bytes or config.LLM_RESPONSE_CACHE_MAX_BYTES
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "writes": 0,
+            "evictions": 0,
+        }
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with get_connection(self.db_path) as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS llm_response_cache(
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed_at REAL NOT NULL
+                )"""
+            )
+            conn.execute(
+                """CREATE INDEX IF NOT EXISTS idx_llm_response_cache_last_accessed
+                ON llm_response_cache (last_accessed_at)"""
+            )
+
+    def _increment(self, counter: str, value: int = 1):
+        with self._stats_lock:
+            self._stats[counter] += value
+
+    @staticmethod
+    def _cache_key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> RETURN_VAL_TYPE | None:
+
+        if _bypass_llm_cache.get():
+            self._increment("bypassed")
+            return None
+
+        key = self._cache_key(prompt, llm_string)
+        now = time.time()
+        with get_connection(self.db_path) as conn:
+            result = conn.execute(
+                """SELECT response FROM llm_response_cache WHERE key = ? AND created_at > ?""",
+                (key, now - self.ttl_seconds),
+            ).fetchone()
+            if result:
+                conn.execute(
+                    """UPDATE llm_response_cache SET last_accessed_at = ? WHERE key = ?""",
+                    (now, key),
+                )
+
+        if not result:
+            self._increment("misses")
+            return None
+
+        self._increment("hits")
+        # LangChain returns cache hits without merging generation_info into the message,
+        # so the flag is also set on the message for callers that only see the response
+        generations = []
+        for message in messages_from_dict(json.loads(result[0])):
+            message.response_metadata = {
+                **message.response_metadata,
+                "llm_cache_hit": True,
+            }
+            generations.append(
+                ChatGeneration(message=message, generation_info={"llm_cache_hit": True})
+            )
+        return generations
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE):
+
+        messages = [
+            generation.message
+            for generation in return_val
+            if isinstance(generation, ChatGeneration)
+        ]
+        if not messages:
+            return
+
+        response = json.dumps(messages_to_dict(messages))
+        now = time.time()
+        with get_connection(self.db_path) as conn:
+            conn.execute(
+                """INSERT OR REPLACE INTO llm_response_cache
+                (key, response, size, created_at, last_accessed_at) VALUES (?,?,?,?,?)""",
+                (
+                    self._cache_key(prompt, llm_string),
+                    response,
+                    len(response.encode("utf-8")),
+                    now,
+                    now,
+                ),
+            )
+        self._increment("writes")
+        self._evict(now)
+
+    def _evict(self, now: float):
+
+        with get_connection(self.db_path) as conn:
+            expired = conn.execute(
+                """DELETE FROM llm_response_cache WHERE created_at <= ?""",
+                (now - self.ttl_seconds,),
+            ).rowcount
+            # Least recently used entries beyond the size budget
+            evicted = conn.execute(
+                """DELETE FROM llm_response_cache WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (
+                            ORDER BY last_accessed_at DESC, key
+                        ) AS retained_size
+                        FROM llm_response_cache
+                    ) WHERE retained_size > ?
+                )""",
+                (self.max_bytes,),
+            ).rowcount
+        if expired or evicted:
+            self._increment("evictions", expired + evicted)
+
+    def clear(self, **kwargs: Any):
+        with get_connection(self.db_path) as conn:
+            conn.execute("""DELETE FROM llm_response_cache""")
+
+    def get_stats(self) -> Dict:
+
+        with get_connection(self.db_path) as conn:
+            entries, size_bytes = conn.execute(
+                """SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_response_cache"""
+            ).fetchone()
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["entries"] = entries
+        stats["size_bytes"] = size_bytes
+        stats["max_size_bytes"] = self.max_bytes
+        stats["ttl_seconds"] = self.ttl_seconds
+        return stats
+
+
+def is_cached_generation(generation: Any) -> bool:
+    generation_info = getattr(generation, "generation_info", None) or {}
+    return bool(generation_info.get("llm_cache_hit"))
+
+
+def is_cached_message(message: Any) -> bool:
+    response_metadata = getattr(message, "response_metadata", None) or {}
+    return bool(response_metadata.get("llm_cache_hit"))
+
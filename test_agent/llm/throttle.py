@@ -0,0 +1,132 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict
+from test_agent import config
+from test_agent.llm.instrumentation import (
+    LLM_RETRY_EVENT,
+    THROTTLE_WAIT_EVENT,
+    report_llm_event,
+)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    status_code = getattr(error, "status_code", None) or getattr(
+        getattr(error, "response", None), "status_code", None
+    )
+    if status_code == 429:
+        return True
+    if "RateLimit" in type(error).__name__ or "ResourceExhausted" in type(error).__name__:
+        return True
+    message = str(error).lower()
+    return any(
+        marker in message
+        for marker in ("429 ", "too many requests", "rate limit", "resource_exhausted")
+    )
+
+
+class PlatformThrottle:
+    # Adaptive (AIMD) concurrency window shared by every event loop in the process:
+    # a rate-limit error halves the window and the call is retried with jittered
+    # exponential backoff; `limit` consecutive successes grow it back by one slot.
+
+    def __init__(self, llm_platform: str, max_concurrency: int):
+        self.llm_platform = llm_platform
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiting = 0
+        self._successes_since_resize = 0
+        self._metrics = {
+            "calls": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "max_waiting": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+    async def _acquire(self) -> float:
+
+        start = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+            self._metrics["max_waiting"] = max(
+                self._metrics["max_waiting"], self._waiting
+            )
+        try:
+            while True:
+                with self._lock:
+                    if self._in_flight < self.limit:
+                        self._in_flight += 1
+                        break
+                await asyncio.sleep(config.LLM_THROTTLE_POLL_SECONDS)
+        finally:
+            wait_seconds = time.perf_counter() - start
+            with self._lock:
+                self._waiting -= 1
+                self._metrics["calls"] += 1
+                self._metrics["total_wait_seconds"] += wait_seconds
+                self._metrics["max_wait_seconds"] = max(
+                    self._metrics["max_wait_seconds"], wait_seconds
+                )
+        return wait_seconds
+
+    def _release(self, rate_limited: bool):
+
+        with self._lock:
+            self._in_flight -= 1
+            if rate_limited:
+                self._metrics["rate_limited"] += 1
+                self.limit = max(1, self.limit // 2)
+                self._successes_since_resize = 0
+            elif self.limit < self.max_concurrency:
+                self._successes_since_resize += 1
+                if self._successes_since_resize >= self.limit:
+                    self.limit += 1
+                    self._successes_since_resize = 0
+
+    async def run(self, call: Callable[[], Awaitable[Any]]) -> Any:
+
+        attempt = 0
+        while True:
+            wait_seconds = await self._acquire()
+            rate_limited = False
+            try:
+                await report_llm_event(
+                    THROTTLE_WAIT_EVENT, {"wait_seconds": wait_seconds}
+                )
+                return await call()
+            except Exception as e:
+                rate_limited = is_rate_limit_error(e)
+                if not rate_limited or attempt >= config.LLM_RATE_LIMIT_MAX_RETRIES:
+                    raise
+            finally:
+                self._release(rate_limited)
+
+            backoff_seconds = min(
+                config.LLM_RATE_LIMIT_BACKOFF_SECONDS * 2**attempt,
+                config.LLM_RATE_LIMIT_MAX_BACKOFF_SECONDS,
+            ) * random.uniform(0.5, 1.5)
+            attempt += 1
+            with self._lock:
+                self._metrics["retries"] += 1
+            print(
+                f"Rate limited by '{self.llm_platform}', retrying in {backoff_seconds:.1f}s (attempt {attempt})"
+            )
+            await report_llm_event(LLM_RETRY_EVENT, {"attempt": attempt})
+            await asyncio.sleep(backoff_seconds)
+
+    def get_metrics(self) -> Dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["limit"] = self.limit
+            metrics["max_concurrency"] = self.max_concurrency
+            metrics["in_flight"] = self._in_flight
+            metrics["waiting"] = self._waiting
+        metrics["avg_wait_seconds"] = (
+            metrics["total_wait_seconds"] / metrics["calls"] if metrics["calls"] else 0.0
+        )
+        return metrics
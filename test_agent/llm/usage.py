@@ -0,0 +1,59 @@
+import threading
+from typing import Any, Dict
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from test_agent.llm.response_cache import is_cached_generation
+
+
+class TokenUsageTracker(BaseCallbackHandler):
+    # Sums the provider reported usage of every LLM call made under one graph run.
+    # Cached input tokens come from `input_token_details.cache_read` (Gemini
+    # cached_content_token_count, OpenAI cached_tokens); Ollama does not report them.
+    # Responses served from the local response cache cost no tokens and are only counted.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._usage = {
+            "llm_calls": 0,
+            "llm_cache_hits": 0,
+            "input_tokens": 0,
+            "cached_input_tokens": 0,
+            "output_tokens": 0,
+        }
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any):
+
+        for generations in response.generations:
+            for generation in generations:
+                if is_cached_generation(generation):
+                    with self._lock:
+                        self._usage["llm_cache_hits"] += 1
+                    continue
+                usage_metadata = getattr(
+                    getattr(generation, "message", None), "usage_metadata", None
+                )
+                if not usage_metadata:
+                    continue
+                input_token_details = usage_metadata.get("input_token_details") or {}
+                with self._lock:
+                    self._usage["llm_calls"] += 1
+                    self._usage["input_tokens"] += usage_metadata.get("input_tokens", 0)
+                    self._usage["cached_input_tokens"] += input_token_details.get(
+                        "cache_read", 0
+                    ) or 0
+                    self._usage["output_tokens"] += usage_metadata.get(
+                        "output_tokens", 0
+                    )
+
+    def get_usage(self) -> Dict:
+        with self._lock:
+            usage = dict(self._usage)
+        usage["uncached_input_tokens"] = (
+            usage["input_tokens"] - usage["cached_input_tokens"]
+        )
+        usage["cache_hit_ratio"] = (
+            usage["cached_input_tokens"] / usage["input_tokens"]
+            if usage["input_tokens"]
+            else 0.0
+        )
+        return usage
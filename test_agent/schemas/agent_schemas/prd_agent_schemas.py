@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from enum import Enum
-from typing import List, Dict, Any, Annotated
+from typing import List, Dict, Any, Annotated, Iterable, Set
 from uuid import UUID
 from langchain_core.messages import BaseMessage
 from langchain_core.documents import Document
@@ -158,12 +158,33 @@ class ProductConcern(BaseModel):
     )
 
 
+def merge_by_id(existing: List, new: List) -> List:
+    # Id-keyed merge: an item whose id is already present is replaced in place instead of
+    # appended again, so replayed tool calls and fan-in never duplicate insights
+    if not new:
+        return existing
+    merged = {item.id: item for item in existing}
+    merged.update((item.id, item) for item in new)
+    return list(merged.values())
+
+
+def add_ids(existing: Set[UUID], new: Iterable[UUID]) -> Set[UUID]:
+    # Tombstone set of deleted ids, kept as a set so filtering stays O(1) per item
+    if not new:
+        return existing
+    return set(existing) | {UUID(str(item_id)) for item_id in new}
+
+
+def active_items(items: List, deleted_ids: Set[UUID]) -> List:
+    return [item for item in items if item.id not in deleted_ids]
+
+
 class BaseInsightsSchema(BaseModel):
     document: PrdDocument
-    insights: Annotated[List[ProductInsight], operator.add] = Field(
+    insights: Annotated[List[ProductInsight], merge_by_id] = Field(
         default_factory=list
     )
-    concerns: Annotated[List[ProductConcern], operator.add] = Field(
+    concerns: Annotated[List[ProductConcern], merge_by_id] = Field(
         default_factory=list
     )
     messages: Annotated[List[BaseMessage], add_messages] = Field(default_factory=list)
@@ -173,6 +194,8 @@ class BaseInsightsSchema(BaseModel):
 
 class InsigntsValidatorState(BaseInsightsSchema):
     prd_chunk: str
+    header_path: str = ""
+    neighbouring_chunks: str = ""
     new_insights: Annotated[List[ProductInsight], operator.add] = Field(
         default_factory=list
     )
@@ -187,5 +210,5 @@ class InsigntsValidatorState(BaseInsightsSchema):
 class PrdAnalyzerAgentState(BaseInsightsSchema):
     project_id: str
     release_id: str
-    deleted_insights: Annotated[List[UUID], operator.add] = Field(default_factory=list)
-    deleted_concerns: Annotated[List[UUID], operator.add] = Field(default_factory=list)
+    deleted_insights: Annotated[Set[UUID], add_ids] = Field(default_factory=set)
+    deleted_concerns: Annotated[Set[UUID], add_ids] = Field(default_factory=set)
@@ -37,3 +37,5 @@ class IngestDocumentResponse(BaseModel):
 
     status: str = "INITIATED"
     message: str = "Document Ingestion is initiated"
+    job_id: UUID | None = None
+    document_id: UUID | None = None
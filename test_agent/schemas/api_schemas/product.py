@@ -20,6 +20,7 @@ class GenerateProductInsightsRequest(BaseModel):
     project_id: UUID
     release_id: UUID
     document_ids: List[UUID]
+    bypass_llm_cache: bool = False
 
 
 class ProductInsightGenerationStatus(str, Enum):
@@ -36,6 +37,7 @@ class GenerateProductInsightsResponse(BaseModel):
     document_id: UUID
     status: ProductInsightGenerationStatus
     message: str = ""
+    job_id: UUID | None = None
 
 
 class ProductInsightCreate(BaseModel):
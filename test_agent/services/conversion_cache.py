@@ -0,0 +1,112 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+from test_agent import config
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+
+def _increment(counter: str, value: int = 1):
+    with _stats_lock:
+        _stats[counter] += value
+
+
+def _cache_entry_path(document_hash: str) -> Path:
+    return Path(config.CONVERSION_CACHE_DIR) / f"{document_hash}.json"
+
+
+def get_cached_conversion(document_hash: str) -> Dict | None:
+
+    entry_path = _cache_entry_path(document_hash)
+    try:
+        cached_conversion = json.loads(entry_path.read_text(encoding="utf-8"))
+        # Refresh mtime so eviction treats this entry as recently used
+        os.utime(entry_path)
+    except (OSError, ValueError):
+        _increment("misses")
+        return None
+
+    _increment("hits")
+    return cached_conversion
+
+
+def cache_conversion(document_hash: str, markdown: str, chunks: List[str]):
+
+    entry_path = _cache_entry_path(document_hash)
+    entry_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Unique per writer across threads and processes; renamed into place atomically
+    with tempfile.NamedTemporaryFile(
+        "w",
+        encoding="utf-8",
+        dir=entry_path.parent,
+        prefix=f"{document_hash}.",
+        suffix=".tmp",
+        delete=False,
+    ) as tmp_file:
+        json.dump({"markdown": markdown, "chunks": chunks}, tmp_file)
+    try:
+        os.replace(tmp_file.name, entry_path)
+    except OSError:
+        Path(tmp_file.name).unlink(missing_ok=True)
+        raise
+    _increment("writes")
+
+    _evict_least_recently_used()
+
+
+def _list_cache_entries() -> List[tuple[Path, os.stat_result]]:
+    cache_dir = Path(config.CONVERSION_CACHE_DIR)
+    if not cache_dir.exists():
+        return []
+    entries = []
+    for entry_path in cache_dir.glob("*.json"):
+        try:
+            entries.append((entry_path, entry_path.stat()))
+        except FileNotFoundError:
+            pass
+    return entries
+
+
+def _remove_stale_tmp_files():
+    # Left behind by writers that died between writing and renaming their entry
+    stale_before = time.time() - config.CONVERSION_CACHE_TMP_MAX_AGE_SECONDS
+    for tmp_path in Path(config.CONVERSION_CACHE_DIR).glob("*.tmp"):
+        try:
+            if tmp_path.stat().st_mtime < stale_before:
+                tmp_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _evict_least_recently_used():
+
+    _remove_stale_tmp_files()
+    entries = sorted(_list_cache_entries(), key=lambda entry: entry[1].st_mtime)
+    total_size = sum(entry[1].st_size for entry in entries)
+
+    for entry_path, entry_stat in entries:
+        if total_size <= config.CONVERSION_CACHE_MAX_BYTES:
+            break
+        try:
+            entry_path.unlink()
+            _increment("evictions")
+        except FileNotFoundError:
+            pass
+        total_size -= entry_stat.st_size
+
+
+def get_conversion_cache_stats() -> Dict:
+
+    entries = _list_cache_entries()
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["entries"] = len(entries)
+    stats["size_bytes"] = sum(entry[1].st_size for entry in entries)
+    stats["max_size_bytes"] = config.CONVERSION_CACHE_MAX_BYTES
+    return stats
@@ -0,0 +1,63 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from test_agent import config
+
+## Set inside each worker process by `_initialize_worker`
+_doc_converter = None
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _initialize_worker():
+    global _doc_converter
+
+    from docling.document_converter import DocumentConverter
+    from docling.datamodel.base_models import InputFormat
+
+    _doc_converter = DocumentConverter()
+    # Load the PDF pipeline (layout / OCR models) once per worker, not per document
+    _doc_converter.initialize_pipeline(InputFormat.PDF)
+
+
+def _convert_to_markdown(document_path: str) -> str:
+    # The worker reads the uploaded file itself; only its path crosses the process boundary
+    try:
+        result = _doc_converter.convert(source=Path(document_path))
+        markdown = result.document.export_to_markdown()
+    except Exception:
+        raise ValueError(
+            "Failed to extract PDF content for the files passed. Please check the file uploaded"
+        )
+    return markdown
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            # spawn (not fork): the API process is multi-threaded
+            _executor = ProcessPoolExecutor(
+                max_workers=config.CONVERSION_WORKER_COUNT,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_initialize_worker,
+            )
+        return _executor
+
+
+def convert_to_markdown(document_path: Path) -> str:
+    # Callers are INGEST_DOCUMENT job workers (one per conversion process), and uploads
+    # past CONVERSION_QUEUE_SIZE active jobs are refused, so no extra gate is needed here
+    return _get_executor().submit(_convert_to_markdown, str(document_path)).result()
+
+
+def shutdown_conversion_workers():
+    global _executor
+
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
@@ -1,37 +1,34 @@
-from docling.document_converter import DocumentConverter
-from docling.datamodel.base_models import DocumentStream
 from langchain_core.documents import Document
 from langchain_text_splitters import MarkdownHeaderTextSplitter
+import asyncio
 import hashlib
-from typing import Union
-from io import BytesIO
+import os
+from typing import AsyncIterator, Union, Dict
+from pathlib import Path
 from uuid import UUID
+from uuid6 import uuid7
+from test_agent import config
 
-from test_agent.db.repositories.document import create_document, create_document_chunks
+from test_agent.db.repositories.document import (
+    create_document,
+    create_document_chunks,
+    get_document_id_by_hash,
+)
+from test_agent.services.conversion_cache import get_cached_conversion, cache_conversion
+from test_agent.services.conversion_worker import convert_to_markdown
 
-doc_converter = DocumentConverter()
 
-
-def _convert_to_markdown(file_content: bytes) -> str:
-    try:
-        pdf_file = BytesIO(file_content)
-        pdf_file.name = "sample.pdf"
-        doc = DocumentStream(name=pdf_file.name, stream=pdf_file)
-        result = doc_converter.convert(source=doc)
-        markdown = result.document.export_to_markdown()
-    except Exception:
-        raise ValueError(
-            "Failed to extract PDF content for the files passed. Please check the file uploaded"
-        )
-    return markdown
-
-
-def _generate_hash(content: Union[bytes, str]) -> str:
+def generate_hash(content: Union[bytes, str]) -> str:
     if type(content) == str:
         content = content.encode("utf-8")
     return hashlib.sha256(content).hexdigest()
 
 
+def _generate_file_hash(document_path: Path) -> str:
+    with open(document_path, "rb") as document_file:
+        return hashlib.file_digest(document_file, "sha256").hexdigest()
+
+
 def _chunk_markdown_document(file_content: str) -> list[Document]:
     text_splitter = MarkdownHeaderTextSplitter(
         headers_to_split_on=[("#", "h1"), ("##", "h2"), ("###", "h3")],
@@ -43,13 +40,32 @@ def _chunk_markdown_document(file_content: str) -> list[Document]:
 def ingest_document(
     project_id: UUID,
     release_id: UUID,
-    document: bytes,
+    document_path: Path,
     document_type: str,
     document_status: str,
+    document_hash: str = None,
 ):
 
-    document_hash = _generate_hash(document)
-    markdown_content = _convert_to_markdown(document)
+    document_hash = document_hash or _generate_file_hash(document_path)
+    if release_id:
+        # Re-synced, unchanged documents skip conversion and chunking entirely
+        existing_document_id = get_document_id_by_hash(
+            document_hash, project_id, release_id
+        )
+        if existing_document_id:
+            return existing_document_id
+
+    cached_conversion = get_cached_conversion(document_hash)
+    if cached_conversion:
+        markdown_content = cached_conversion["markdown"]
+        chunks = cached_conversion["chunks"]
+    else:
+        markdown_content = convert_to_markdown(document_path)
+        chunks = [
+            chunk.page_content for chunk in _chunk_markdown_document(markdown_content)
+        ]
+        cache_conversion(document_hash, markdown_content, chunks)
+
     document_id = create_document(
         project_id=project_id,
         document_type=document_type,
@@ -58,7 +74,72 @@ def ingest_document(
         document_status=document_status,
         release_id=release_id,
     )
-    chunks = [
-        chunk.page_content for chunk in _chunk_markdown_document(markdown_content)
-    ]
     create_document_chunks(document_id, chunks)
+    return document_id
+
+
+def save_uploaded_document(document: bytes) -> Path:
+    config.UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+    document_path = config.UPLOADS_DIR / f"{uuid7()}.pdf"
+    document_path.write_bytes(document)
+    return document_path
+
+
+async def spool_uploaded_document(
+    chunks: AsyncIterator[bytes], max_bytes: int = None
+) -> Dict:
+    # Writes the upload to UPLOADS_DIR as it arrives and hashes it on the way, so memory
+    # stays bounded by one chunk whatever the document size
+    max_bytes = max_bytes or config.UPLOAD_MAX_BYTES
+    config.UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+    document_path = config.UPLOADS_DIR / f"{uuid7()}.pdf"
+    partial_path = document_path.with_suffix(".part")
+
+    document_hash = hashlib.sha256()
+    size_bytes = 0
+    try:
+        with open(partial_path, "wb") as document_file:
+            async for chunk in chunks:
+                size_bytes += len(chunk)
+                if size_bytes > max_bytes:
+                    raise ValueError(
+                        f"Document exceeds the upload limit of {max_bytes} bytes"
+                    )
+                document_hash.update(chunk)
+                await asyncio.to_thread(document_file.write, chunk)
+        os.replace(partial_path, document_path)
+    except BaseException:
+        partial_path.unlink(missing_ok=True)
+        raise
+
+    return {
+        "document_path": document_path,
+        "document_hash": document_hash.hexdigest(),
+        "size_bytes": size_bytes,
+    }
+
+
+def ingest_uploaded_document(
+    project_id: UUID,
+    release_id: UUID,
+    document_path: str,
+    document_type: str,
+    document_status: str,
+    document_hash: str = None,
+) -> Dict:
+
+    document_path = Path(document_path)
+    document_id = ingest_document(
+        project_id=project_id,
+        release_id=release_id,
+        document_path=document_path,
+        document_type=document_type,
+        document_status=document_status,
+        document_hash=document_hash,
+    )
+    document_path.unlink(missing_ok=True)
+    return {"document_id": str(document_id)}
+
+
+def discard_uploaded_document(document_path: str):
+    Path(document_path).unlink(missing_ok=True)
@@ -0,0 +1,168 @@
+import threading
+import traceback
+from enum import Enum
+from typing import Callable, Dict
+from uuid import UUID
+from uuid6 import uuid7
+from test_agent import config
+from test_agent.db.repositories.job import (
+    create_job,
+    claim_job,
+    renew_job_lease,
+    complete_job,
+    fail_job,
+    requeue_expired_jobs,
+    count_active_jobs,
+)
+from test_agent.db.repositories.product import delete_job_findings
+from test_agent.services.document_service import (
+    ingest_uploaded_document,
+    discard_uploaded_document,
+)
+from test_agent.services.product_service import generate_insights
+
+
+class JobType(str, Enum):
+    INGEST_DOCUMENT = "INGEST_DOCUMENT"
+    GENERATE_INSIGHTS = "GENERATE_INSIGHTS"
+
+
+def _ingest_document_job(job: Dict) -> Dict:
+    return ingest_uploaded_document(**job["payload"])
+
+
+def _generate_insights_job(job: Dict) -> Dict:
+    # The job id tags every persisted finding, so a retry can first drop the findings
+    # of an interrupted attempt
+    return generate_insights(**job["payload"], job_id=job["id"])
+
+
+def _discard_uploaded_document(job: Dict):
+    discard_uploaded_document(job["payload"]["document_path"])
+
+
+def _discard_job_findings(job: Dict):
+    delete_job_findings(job["id"])
+
+
+JOB_HANDLERS: Dict[str, Callable[[Dict], Dict | None]] = {
+    JobType.INGEST_DOCUMENT: _ingest_document_job,
+    JobType.GENERATE_INSIGHTS: _generate_insights_job,
+}
+
+## Run once a job has failed for the last time (errored or its lease expired)
+JOB_FAILURE_HANDLERS: Dict[str, Callable[[Dict], None]] = {
+    JobType.INGEST_DOCUMENT: _discard_uploaded_document,
+    JobType.GENERATE_INSIGHTS: _discard_job_findings,
+}
+
+_stop_event = threading.Event()
+_worker_threads: list[threading.Thread] = []
+
+
+def enqueue_job(job_type: JobType, payload: Dict) -> UUID:
+    return create_job(JobType(job_type).value, payload)
+
+
+def is_ingest_queue_full() -> bool:
+    # Backpressure on the durable queue itself: the conversion pool only ever sees
+    # JOB_WORKERS["INGEST_DOCUMENT"] documents at a time
+    return (
+        count_active_jobs(JobType.INGEST_DOCUMENT.value) >= config.CONVERSION_QUEUE_SIZE
+    )
+
+
+def _retry_delay_seconds(attempts: int) -> int:
+    return min(
+        config.JOB_RETRY_BASE_DELAY_SECONDS * 2 ** max(attempts - 1, 0),
+        config.JOB_RETRY_MAX_DELAY_SECONDS,
+    )
+
+
+def _handle_final_failure(job: Dict):
+    failure_handler = JOB_FAILURE_HANDLERS.get(job["job_type"])
+    if failure_handler is None:
+        return
+    try:
+        failure_handler(job)
+    except Exception as e:
+        print(f"Failure handler of job '{job['id']}' ({job['job_type']}) failed \n Exception : {e}")
+
+
+def _keep_lease_alive(job_id: UUID, worker_id: str, job_done: threading.Event):
+    while not job_done.wait(config.JOB_LEASE_SECONDS / 3):
+        if not renew_job_lease(job_id, worker_id):
+            return
+
+
+def _run_job(job: Dict, worker_id: str):
+
+    job_done = threading.Event()
+    heartbeat = threading.Thread(
+        target=_keep_lease_alive,
+        args=(job["id"], worker_id, job_done),
+        name=f"{worker_id}-heartbeat",
+        daemon=True,
+    )
+    heartbeat.start()
+    try:
+        job_result = JOB_HANDLERS[job["job_type"]](job)
+    except Exception as e:
+        print(
+            f"Job '{job['id']}' ({job['job_type']}) failed on attempt {job['attempts']}/{job['max_attempts']} \n Exception : {e}"
+        )
+        traceback.print_exc()
+        fail_job(
+            job["id"],
+            worker_id,
+            error=f"{type(e).__name__}: {e}",
+            retry_delay_seconds=_retry_delay_seconds(job["attempts"]),
+        )
+        if job["attempts"] >= job["max_attempts"]:
+            _handle_final_failure(job)
+    else:
+        complete_job(job["id"], worker_id, job_result)
+    finally:
+        job_done.set()
+        heartbeat.join()
+
+
+def _worker_loop(job_type: str, worker_id: str):
+
+    while not _stop_event.is_set():
+        try:
+            for failed_job in requeue_expired_jobs():
+                _handle_final_failure(failed_job)
+            job = claim_job(job_type, worker_id)
+        except Exception as e:
+            print(f"Job worker '{worker_id}' failed to poll the job queue \n Exception : {e}")
+            job = None
+
+        if job is None:
+            _stop_event.wait(config.JOB_POLL_INTERVAL_SECONDS)
+            continue
+        _run_job(job, worker_id)
+
+
+def start_job_workers(job_workers: Dict[str, int] = None):
+
+    _stop_event.clear()
+    for job_type, worker_count in (job_workers or config.JOB_WORKERS).items():
+        for _ in range(worker_count):
+            worker_id = f"{job_type.lower()}-worker-{uuid7()}"
+            worker = threading.Thread(
+                target=_worker_loop,
+                args=(job_type, worker_id),
+                name=worker_id,
+                daemon=True,
+            )
+            worker.start()
+            _worker_threads.append(worker)
+
+
+def stop_job_workers(timeout: float = None):
+
+    _stop_event.set()
+    for worker in _worker_threads:
+        worker.join(timeout)
+    _worker_threads.clear()
@@ -1,56 +1,340 @@
 from uuid import UUID
-from typing import List
+from uuid6 import uuid7
+from typing import AsyncIterator, List, Dict
+import asyncio
+from test_agent import config
 from langchain_core.documents import Document
+from test_agent.db.connection import run_in_db_executor
 from test_agent.db.repositories.document import (
     get_documents_by_ids,
     get_document_chunks,
+    get_previous_document_revision,
 )
 from test_agent.agents.prd_agent.prd_analyzer_agent import (
     PrdAnalyzerAgent,
     PrdAnalyzerAgentState,
 )
-from test_agent.schemas.agent_schemas.prd_agent_schemas import PrdDocument
-from test_agent.db.repositories.product import create_insights, create_concerns
+from test_agent.agents.prd_agent.relevance_index import RelevanceIndex
+from test_agent.schemas.agent_schemas.prd_agent_schemas import (
+    PrdDocument,
+    ProductInsight,
+    ProductConcern,
+)
+from test_agent.db.repositories.product import (
+    create_insights,
+    create_concerns,
+    get_insights,
+    get_concerns,
+    delete_insights,
+    delete_concerns,
+    delete_job_findings,
+)
+from test_agent.llm.response_cache import llm_cache_bypass
+
+
+def _attribute_to_chunks(items: List, chunks: List[Dict]) -> Dict[UUID, str]:
+    # Each insight / concern is attributed to the chunk it matches best, so a later
+    # revision can reuse it while that chunk is unchanged
+    chunk_index = RelevanceIndex(chunks, text_fn=lambda chunk: chunk["content"])
+    source_chunk_hashes = {}
+    for item in items:
+        best_chunks = chunk_index.top_k(
+            f"{getattr(item, 'title', '')} {item.description}", 1
+        )
+        if best_chunks:
+            source_chunk_hashes[item.id] = best_chunks[0]["content_hash"]
+    return source_chunk_hashes
+
+
+def _load_reusable_findings(
+    loaded_doc: Dict, project_id: UUID, release_id: UUID
+) -> Dict | None:
+
+    previous_revision = get_previous_document_revision(
+        loaded_doc["id"], project_id, release_id
+    )
+    if not previous_revision or (
+        previous_revision["shared_chunks"]
+        < len(loaded_doc["chunks"]) * config.INCREMENTAL_ANALYSIS_MIN_SHARED_CHUNK_RATIO
+    ):
+        return None
+
+    # Chunks without a content hash (stored before hashing) always count as changed
+    previous_chunk_hashes = {
+        chunk["content_hash"] for chunk in get_document_chunks(previous_revision["id"])
+    } - {None}
+    unchanged_chunk_hashes = previous_chunk_hashes & {
+        chunk["content_hash"] for chunk in loaded_doc["chunks"]
+    }
 
+    findings = {
+        "previous_document_id": previous_revision["id"],
+        "changed_chunks": [
+            chunk
+            for chunk in loaded_doc["chunks"]
+            if chunk["content_hash"] not in previous_chunk_hashes
+        ],
+        "source_chunk_hashes": {},
+    }
+    for key, get_findings, model in (
+        ("insights", get_insights, ProductInsight),
+        ("concerns", get_concerns, ProductConcern),
+    ):
+        findings[key] = []
+        for row in get_findings(project_id, release_id, previous_revision["id"]):
+            if row["source_chunk_hash"] not in unchanged_chunk_hashes:
+                continue
+            item = model.model_validate_json(row["details"]).model_copy(
+                update={"id": uuid7(), "source_document": loaded_doc["id"]}
+            )
+            findings[key].append(item)
+            findings["source_chunk_hashes"][item.id] = row["source_chunk_hash"]
+    return findings
 
-def generate_insights(document_ids: List[UUID], project_id: UUID, release_id: UUID):
 
-    loaded_documents = get_documents_by_ids(document_ids)
+async def _persist_findings(
+    event: Dict,
+    loaded_doc: Dict,
+    project_id: UUID,
+    release_id: UUID,
+    source_chunk_hashes: Dict[UUID, str],
+    job_id: UUID = None,
+):
+
+    if event["event"] in ("insights", "concerns"):
+        new_items = [item for item in event["data"] if item.id not in source_chunk_hashes]
+        # BM25 attribution is CPU-bound; keep it off the event loop serving the stream
+        source_chunk_hashes.update(
+            await asyncio.to_thread(_attribute_to_chunks, new_items, loaded_doc["chunks"])
+        )
+        await run_in_db_executor(
+            create_insights if event["event"] == "insights" else create_concerns,
+            project_id,
+            release_id,
+            loaded_doc["id"],
+            event["data"],
+            source_chunk_hashes,
+            job_id,
+        )
+    elif event["event"] == "deleted_insights":
+        await run_in_db_executor(delete_insights, event["data"])
+    elif event["event"] == "deleted_concerns":
+        await run_in_db_executor(delete_concerns, event["data"])
+
+
+def _delete_persisted_findings(persisted: Dict[str, List[UUID]]):
+    delete_insights(persisted["insights"])
+    delete_concerns(persisted["concerns"])
 
-    for loaded_doc in loaded_documents:
-        ## Update job_status table to IN_PROGRESS for document_id
-        loaded_doc["chunks"] = [
-            Document(chunk["content"], id=chunk["id"])
-            for chunk in get_document_chunks(loaded_doc["id"])
-        ]
 
-        document = PrdDocument(
-            id=loaded_doc["id"],
-            hash=loaded_doc["hash"],
-            page_content=loaded_doc["content"],
-            chunks=loaded_doc["chunks"],
+async def astream_document_insights(
+    loaded_doc: Dict, project_id: UUID, release_id: UUID, job_id: UUID = None
+) -> AsyncIterator[Dict]:
+    # Persists and yields every batch of insights / concerns / deleted ids as the graph
+    # produces it, then a "summary" event. If the run fails or the consumer stops early,
+    # the findings already written by this run are soft deleted again.
+
+    reusable_findings = None
+    if config.INCREMENTAL_ANALYSIS_ENABLED:
+        reusable_findings = await run_in_db_executor(
+            _load_reusable_findings, loaded_doc, project_id, release_id
         )
 
-        agent_state = PrdAnalyzerAgentState(
-            project_id=str(project_id),
-            release_id=str(release_id),
-            document=document,
+    if reusable_findings is None:
+        analysed_chunks = loaded_doc["chunks"]
+        page_content = loaded_doc["content"]
+        reused_insights, reused_concerns, source_chunk_hashes = [], [], {}
+    else:
+        # Only the added / modified sections are analysed, with the findings of the
+        # unchanged sections as the existing knowledge
+        analysed_chunks = reusable_findings["changed_chunks"]
+        page_content = "\n\n".join(chunk["content"] for chunk in analysed_chunks)
+        reused_insights = reusable_findings["insights"]
+        reused_concerns = reusable_findings["concerns"]
+        source_chunk_hashes = reusable_findings["source_chunk_hashes"]
+        print(
+            f"Incremental analysis of document '{loaded_doc['id']}' against '{reusable_findings['previous_document_id']}' - "
+            f"{len(analysed_chunks)}/{len(loaded_doc['chunks'])} chunks changed, "
+            f"reusing {len(reused_insights)} insights and {len(reused_concerns)} concerns"
         )
 
-        agent = PrdAnalyzerAgent()
-        result = agent.invoke(state=agent_state)
+    persisted = {"insights": [], "concerns": []}
+    try:
+        for event in (
+            {"event": "insights", "data": reused_insights},
+            {"event": "concerns", "data": reused_concerns},
+        ):
+            if event["data"]:
+                await _persist_findings(
+                    event,
+                    loaded_doc,
+                    project_id,
+                    release_id,
+                    source_chunk_hashes,
+                    job_id,
+                )
+                persisted[event["event"]].extend(item.id for item in event["data"])
+                yield event
+
+        if analysed_chunks:
+            document = PrdDocument(
+                id=loaded_doc["id"],
+                hash=loaded_doc["hash"],
+                page_content=page_content,
+                chunks=[
+                    Document(chunk["content"], id=chunk["id"])
+                    for chunk in analysed_chunks
+                ],
+            )
+
+            agent_state = PrdAnalyzerAgentState(
+                project_id=str(project_id),
+                release_id=str(release_id),
+                document=document,
+                insights=reused_insights,
+                concerns=reused_concerns,
+            )
+
+            result = None
+            async for event in PrdAnalyzerAgent().astream(state=agent_state):
+                if event["event"] == "result":
+                    result = event["data"]
+                    continue
+                await _persist_findings(
+                    event,
+                    loaded_doc,
+                    project_id,
+                    release_id,
+                    source_chunk_hashes,
+                    job_id,
+                )
+                if event["event"] in persisted:
+                    persisted[event["event"]].extend(item.id for item in event["data"])
+                yield event
+            insights, concerns = result["insights"], result["concerns"]
+            token_usage = result["token_usage"]
+            reflection_rounds = result["reflection_rounds"]
+        else:
+            insights, concerns = reused_insights, reused_concerns
+            token_usage, reflection_rounds = None, 0
+    except BaseException:
+        # Shielded, so a second cancellation cannot interrupt the cleanup half way
+        await asyncio.shield(run_in_db_executor(_delete_persisted_findings, persisted))
+        raise
 
-        insight_ids = create_insights(
-            project_id=project_id,
-            release_id=release_id,
-            document_id=loaded_doc["id"],
-            product_insights=result["insights"],
+    yield {
+        "event": "summary",
+        "data": {
+            "status": "COMPLETED",
+            "insights": len(insights),
+            "concerns": len(concerns),
+            "analysed_chunks": len(analysed_chunks),
+            "reused_insights": len(reused_insights),
+            "reused_concerns": len(reused_concerns),
+            "reflection_rounds": reflection_rounds,
+            "token_usage": token_usage,
+        },
+    }
+
+
+async def _generate_document_insights(
+    loaded_doc: Dict, project_id: UUID, release_id: UUID, job_id: UUID = None
+) -> Dict:
+
+    summary = None
+    async for event in astream_document_insights(
+        loaded_doc, project_id, release_id, job_id
+    ):
+        if event["event"] == "summary":
+            summary = event["data"]
+    return summary
+
+
+async def agenerate_insights(
+    document_ids: List[UUID],
+    project_id: UUID,
+    release_id: UUID,
+    max_concurrency: int = None,
+    bypass_llm_cache: bool = False,
+    job_id: UUID = None,
+) -> Dict:
+
+    if job_id:
+        # A retried job first drops what its interrupted attempt already persisted
+        await run_in_db_executor(delete_job_findings, job_id)
+
+    loaded_documents = await run_in_db_executor(
+        get_documents_by_ids, document_ids, include_chunks=True
+    )
+    if not loaded_documents:
+        return {}
+
+    semaphore = asyncio.Semaphore(
+        max_concurrency or config.INSIGHT_GENERATION_MAX_CONCURRENCY
+    )
+
+    async def generate_with_limit(loaded_doc: Dict) -> Dict:
+        async with semaphore:
+            try:
+                return await _generate_document_insights(
+                    loaded_doc, project_id, release_id, job_id
+                )
+            except Exception as e:
+                print(
+                    f"Failed to generate insights for document '{loaded_doc['id']}' \n Exception : {e}"
+                )
+                return {"status": "FAILED", "error": f"{type(e).__name__}: {e}"}
+
+    with llm_cache_bypass(bypass_llm_cache):
+        results = await asyncio.gather(
+            *[generate_with_limit(loaded_doc) for loaded_doc in loaded_documents]
+        )
+    generation_summary = {
+        loaded_doc["id"]: result for loaded_doc, result in zip(loaded_documents, results)
+    }
+
+    if all(summary["status"] == "FAILED" for summary in generation_summary.values()):
+        raise RuntimeError(
+            f"Insight generation failed for all documents - {generation_summary}"
         )
+    return generation_summary
+
 
-        concern_ids = create_concerns(
-            project_id=project_id,
-            release_id=release_id,
-            document_id=loaded_doc["id"],
-            product_concerns=result["concerns"],
+def generate_insights(
+    document_ids: List[UUID],
+    project_id: UUID,
+    release_id: UUID,
+    max_concurrency: int = None,
+    bypass_llm_cache: bool = False,
+    job_id: UUID = None,
+) -> Dict:
+    return asyncio.run(
+        agenerate_insights(
+            document_ids,
+            project_id,
+            release_id,
+            max_concurrency,
+            bypass_llm_cache,
+            job_id,
         )
-        ## Update job_status table to COMPLETED for document_id
+    )
+
+
+async def astream_insights(
+    document_id: UUID,
+    project_id: UUID,
+    release_id: UUID,
+    bypass_llm_cache: bool = False,
+) -> AsyncIterator[Dict]:
+
+    loaded_documents = await run_in_db_executor(
+        get_documents_by_ids, [document_id], include_chunks=True
+    )
+    if not loaded_documents:
+        raise ValueError(f"No document found with document_id {document_id}")
+
+    with llm_cache_bypass(bypass_llm_cache):
+        async for event in astream_document_insights(
+            loaded_documents[0], project_id, release_id
+        ):
+            yield event
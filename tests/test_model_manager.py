@@ -0,0 +1,24 @@
+from langchain_core.messages import HumanMessage
+from langchain_ollama import ChatOllama
+from langchain_openai import ChatOpenAI
+from test_agent.agents.prd_agent.insight_tools import add_concern, add_product_insight
+from test_agent.llm.model_manager import ModelManager
+
+
+def test_prompt_cache_key_is_sent_to_openai():
+    llm = ChatOpenAI(model="gpt-4o-mini", api_key="test-key")
+
+    bound = ModelManager.bind_prompt_cache(
+        llm.bind_tools([add_product_insight, add_concern]),
+        prompt_cache_key="document-hash",
+    )
+    payload = llm._get_request_payload([HumanMessage("prd")], **bound.kwargs)
+
+    assert payload["prompt_cache_key"] == "document-hash"
+    assert len(payload["tools"]) == 2
+
+
+def test_prompt_cache_key_is_not_bound_for_other_platforms():
+    llm = ChatOllama(model="llama3.1").bind_tools([add_product_insight])
+
+    assert ModelManager.bind_prompt_cache(llm, prompt_cache_key="document-hash") is llm
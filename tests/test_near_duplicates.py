@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+from test_agent import config
+from test_agent.agents.prd_agent.near_duplicates import (
+    candidate_probability,
+    find_near_duplicates,
+    jaccard_similarity,
+    lsh_band_layout,
+    shingles,
+    _item_text,
+)
+
+SHARED = (
+    "the checkout page must validate the card number expiry date and security code "
+    "before the payment request is sent to the provider"
+)
+
+
+def _insight(description: str) -> SimpleNamespace:
+    return SimpleNamespace(title="Card validation", description=description)
+
+
+def test_band_layout_reaches_the_ambiguous_threshold():
+    bands, rows = lsh_band_layout()
+
+    assert bands * rows == config.NEAR_DUPLICATE_NUM_PERMUTATIONS
+    assert (
+        candidate_probability(config.NEAR_DUPLICATE_AMBIGUOUS_THRESHOLD, bands, rows)
+        >= config.NEAR_DUPLICATE_LSH_MIN_RECALL
+    )
+
+
+def test_reworded_pair_is_ambiguous():
+    first = _insight(f"{SHARED} and show an inline error next to each invalid field")
+    second = _insight(
+        f"{SHARED} otherwise a toast lists every rejected input so users"
+    )
+    similarity = jaccard_similarity(
+        shingles(_item_text(first)), shingles(_item_text(second))
+    )
+    assert 0.5 <= similarity <= 0.6
+
+    result = find_near_duplicates([first, second])
+
+    assert result["duplicates"] == []
+    assert result["ambiguous"] == [first, second]
+
+
+def test_near_exact_pair_is_a_duplicate():
+    first = _insight(f"{SHARED} and show an inline error next to each invalid field")
+    second = _insight(f"{SHARED} and show an inline error next to every invalid field.")
+
+    result = find_near_duplicates([first, second])
+
+    assert len(result["duplicates"]) == 1
+    assert result["ambiguous"] == []